@@ -0,0 +1,84 @@
+"""Micro-benchmark of the hourly aggregation of TSDB series.
+
+Compares the single-pass, array-backed aggregation with the former dict-based one
+on backfill-sized inputs (several months of 15-minute values).
+
+    python benchmarks/bench_aggregation.py [--days 90 180 365] [--repeat 5]
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import random
+import timeit
+
+from integration import load
+
+aggregation = load("aggregation")
+
+TZ = timezone(timedelta(hours=1))
+
+def make_series(days: int) -> list[dict]:
+    """Build a synthetic 15-minute water series, as returned by the TSDB reader."""
+    rng = random.Random(days)
+    start = datetime(2025, 1, 1, tzinfo=TZ)
+    values = []
+    for index in range(days * 96):
+        time = start + timedelta(minutes=15 * index)
+        water = rng.choice((0, 0, 0, 1.5, 4.0, 12.0))
+        values.append({"time": time.isoformat(), "water": water})
+    return values
+
+def legacy_aggregate(values: list[dict]) -> tuple[list, datetime | None]:
+    """Former implementation: dict keyed by datetime, sorted afterwards, and a second pass for the last sync."""
+    hourly_data = {}
+    for entry in values:
+        if entry.get("water") is None:
+            continue
+
+        time = datetime.fromisoformat(entry["time"])
+        if not time:
+            continue
+
+        hour_timestamp = time.replace(minute=0, second=0, microsecond=0)
+
+        if hour_timestamp > datetime.now(timezone.utc) + timedelta(hours=1):
+            continue
+
+        if hour_timestamp not in hourly_data:
+            hourly_data[hour_timestamp] = 0.0
+        hourly_data[hour_timestamp] += float(entry["water"])
+
+    hours = [(hour.astimezone(timezone.utc), hourly_data[hour]) for hour in sorted(hourly_data.keys())]
+
+    last_sync_at = None
+    for entry in reversed(values):
+        if entry.get("water") is not None:
+            last_sync_at = datetime.fromisoformat(entry["time"])
+            break
+
+    return hours, last_sync_at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, nargs="+", default=[2, 30, 90, 365])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+
+    print(f"{'days':>6} {'points':>8} {'legacy (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8}")
+    for days in args.days:
+        values = make_series(days)
+
+        # Both implementations must agree before being compared
+        legacy_hours, legacy_last_sync = legacy_aggregate(values)
+        result = aggregation.aggregate_hourly(values, now)
+        assert [(hour, usage) for hour, usage in result.items()] == legacy_hours
+        assert result.last_sync_at == legacy_last_sync
+
+        legacy = min(timeit.repeat(lambda: legacy_aggregate(values), number=1, repeat=args.repeat))
+        single_pass = min(timeit.repeat(lambda: aggregation.aggregate_hourly(values, now), number=1, repeat=args.repeat))
+
+        print(f"{days:>6} {len(values):>8} {legacy * 1000:>12.2f} {single_pass * 1000:>17.2f} {legacy / single_pass:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Benchmark of an update cycle against a local stand-in of the HomeWizard cloud.
+
+Drives HomeWizardCloudApi and the coordinator's fetch pipeline (TsdbFetcher, day
+cache and hourly aggregation) against 1 to 1000 meters, and reports the wall time,
+request count, response bytes and peak memory of a cold cycle (device list, both
+days) and a warm one (yesterday served from the day cache). The recorder import
+is not part of the measure.
+
+    python benchmarks/bench_cloud.py --meters 1 10 100 1000 --latency 50
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+from itertools import chain
+import multiprocessing
+import socket
+import time
+import tracemalloc
+from zoneinfo import ZoneInfo
+
+import aiohttp
+from aiohttp import web
+
+from cloud_standin import HOME_ID, CloudStandin, urls
+from integration import load
+
+aggregation = load("aggregation")
+api_module = load("api")
+cache = load("cache")
+fetcher_module = load("fetcher")
+scheduler = load("scheduler")
+const = load("const")
+
+TIMEZONE = "Europe/Amsterdam"
+
+def _serve(port: int, meters: int, latency: float, error_rate: float, split_batches: bool) -> None:
+    standin = CloudStandin(meters, latency, error_rate, split_batches)
+    web.run_app(standin.app(), host="127.0.0.1", port=port, print=None)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _wait_ready(session: aiohttp.ClientSession, base: str) -> None:
+    for _ in range(100):
+        try:
+            async with session.get(f"{base}/_stats"):
+                return
+        except aiohttp.ClientError:
+            await asyncio.sleep(0.05)
+    raise RuntimeError("The cloud stand-in did not start")
+
+async def _stats(session: aiohttp.ClientSession, base: str, reset: bool = False) -> dict:
+    async with session.request("POST" if reset else "GET", f"{base}/{'_reset' if reset else '_stats'}") as response:
+        return await response.json()
+
+async def _cycle(api, fetcher, devices: list | None) -> list:
+    """Run the hot path of one coordinator update, return the device list."""
+    if devices is None:
+        devices_data = await api.async_get_devices(HOME_ID)
+        devices = [device for device in devices_data["data"]["home"]["devices"] if device.get("type") == "watermeter"]
+        api.set_polled_meters("bench", len(devices))
+
+    now = datetime.now(ZoneInfo(TIMEZONE))
+    stats_today, stats_yesterday = await asyncio.gather(
+        fetcher.async_fetch_day(now, TIMEZONE, devices),
+        fetcher.async_fetch_day(now - timedelta(days=1), TIMEZONE, devices),
+    )
+
+    for device in devices:
+        today = stats_today.get(device["identifier"]) or {}
+        yesterday = stats_yesterday.get(device["identifier"]) or {}
+        aggregation.aggregate_hourly(chain(yesterday.get("values", []), today.get("values", [])), now)
+
+    return devices
+
+async def _measure(session, base, run) -> dict:
+    await _stats(session, base, reset=True)
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    failure = None
+    try:
+        result = await run()
+    except api_module.HomeWizardCloudError as ex:
+        # High error rates are part of what is measured, report the failed cycle
+        result = None
+        failure = f"failed: {ex}"
+    wall = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    stats = await _stats(session, base)
+    return {
+        "result": result,
+        "failure": failure,
+        "wall": wall,
+        "requests": stats["requests"],
+        "errors": stats["errors"],
+        "bytes": stats["bytes"],
+        "peak": peak,
+    }
+
+async def _bench(meters: int, args) -> tuple[dict, dict]:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = multiprocessing.Process(
+        target=_serve,
+        args=(port, meters, args.latency / 1000, args.error_rate, not args.aggregate_batches),
+        daemon=True,
+    )
+    server.start()
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await _wait_ready(session, base)
+
+            limiter = None if args.no_limiter else scheduler.GlobalRequestLimiter(
+                const.GLOBAL_MAX_CONCURRENT_REQUESTS, const.GLOBAL_MAX_REQUESTS_PER_SECOND
+            )
+            api = api_module.HomeWizardCloudApi("bench@example.com", "bench", session, "bench", limiter, urls(base))
+            fetcher = fetcher_module.TsdbFetcher(api, cache.TsdbDayCache(), args.concurrency)
+
+            cold = await _measure(session, base, lambda: _cycle(api, fetcher, None))
+            warm = await _measure(session, base, lambda: _cycle(api, fetcher, cold["result"]))
+            return cold, warm
+    finally:
+        server.terminate()
+        server.join()
+
+def _row(meters: int, name: str, measure: dict) -> str:
+    return (
+        f"{meters:>7} {name:>5} {measure['wall'] * 1000:>10.1f} {measure['requests']:>9} "
+        f"{measure['errors']:>7} {measure['bytes'] / 1024:>10.1f} {measure['peak'] / 1024:>10.1f}"
+        f"  {measure['failure'] or 'ok'}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--meters", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=50.0, help="latency per request, in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--concurrency", type=int, default=const.DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--aggregate-batches", action="store_true", help="the stand-in cannot split batched queries per device")
+    parser.add_argument("--no-limiter", action="store_true", help="disable the global request limiter")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+
+    print(f"{'meters':>7} {'cycle':>5} {'wall (ms)':>10} {'requests':>9} {'errors':>7} {'bytes (KiB)':>10} {'peak (KiB)':>10}  result")
+    for meters in args.meters:
+        cold, warm = asyncio.run(_bench(meters, args))
+        print(_row(meters, "cold", cold))
+        print(_row(meters, "warm", warm))
+
+if __name__ == "__main__":
+    main()
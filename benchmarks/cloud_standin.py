@@ -0,0 +1,167 @@
+"""Local stand-in of the HomeWizard cloud.
+
+Emulates the endpoints used by the integration (auth, locations, GraphQL
+DeviceList and tsdb-reader) with synthetic 15-minute water series, and a
+configurable latency and error rate. Counters of requests and response bytes
+are exposed on /_stats.
+
+    python benchmarks/cloud_standin.py --port 8080 --meters 10 --latency 50
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+import gzip
+import random
+import zlib
+from zoneinfo import ZoneInfo
+
+from aiohttp import web
+
+TOKEN = "standin-token"
+HOME_ID = 1
+
+class CloudStandin:
+    def __init__(self, meters: int, latency: float = 0.0, error_rate: float = 0.0, split_batches: bool = True, seed: int = 0):
+        self.meters = meters
+        self.latency = latency
+        self.error_rate = error_rate
+        # Whether a multi-device TSDB query is answered per device or aggregated
+        self.split_batches = split_batches
+        self._random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "bytes": 0, "by_endpoint": {}}
+
+    def identifiers(self) -> list[str]:
+        return [f"watermeter/{index:06x}" for index in range(self.meters)]
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/v1/auth/account/token", self._auth)
+        app.router.add_get("/locations", self._locations)
+        app.router.add_post("/v1/graphql", self._graphql)
+        app.router.add_post("/devices/date/{year}/{month}/{day}", self._tsdb)
+        app.router.add_get("/_stats", self._get_stats)
+        app.router.add_post("/_reset", self._reset)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        if request.path.startswith("/_"):
+            return await handler(request)
+
+        endpoint = request.match_info.route.resource.canonical if request.match_info.route.resource else request.path
+        self.stats["requests"] += 1
+        self.stats["by_endpoint"][endpoint] = self.stats["by_endpoint"].get(endpoint, 0) + 1
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self._random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=503)
+
+        if not request.path.startswith("/v1/auth") and request.headers.get("Authorization") != f"Bearer {TOKEN}":
+            return web.Response(status=401)
+
+        response = await handler(request)
+
+        # Compressed ahead of time, so that the counted bytes are the transferred ones
+        if "gzip" in request.headers.get("Accept-Encoding", "") and response.body:
+            response.body = gzip.compress(response.body, compresslevel=5)
+            response.headers["Content-Encoding"] = "gzip"
+
+        self.stats["bytes"] += len(response.body or b"")
+        return response
+
+    async def _auth(self, request: web.Request) -> web.Response:
+        return web.json_response({"access_token": TOKEN, "expires_in": 3600})
+
+    async def _locations(self, request: web.Request) -> web.Response:
+        return web.json_response([{"id": HOME_ID, "name": "Home", "location": "Stand-in"}])
+
+    async def _graphql(self, request: web.Request) -> web.Response:
+        devices = [
+            {
+                "identifier": identifier,
+                "name": f"Watermeter {index}",
+                "wifiStrength": 80,
+                "type": "watermeter",
+                "model": "HWE-WTR",
+                "hardwareVersion": "1",
+                "version": "2.0",
+                "onlineState": "online",
+            }
+            for index, identifier in enumerate(self.identifiers())
+        ]
+        return web.json_response({"data": {"home": {"devices": devices}}})
+
+    async def _tsdb(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        tz = ZoneInfo(payload.get("tz") or "UTC")
+        day = datetime(
+            int(request.match_info["year"]),
+            int(request.match_info["month"]),
+            int(request.match_info["day"]),
+            tzinfo=tz,
+        )
+        identifiers = [device["identifier"] for device in payload.get("devices", [])]
+
+        series = {identifier: self.series(identifier, day) for identifier in identifiers}
+
+        if len(identifiers) == 1:
+            return web.json_response({"values": series[identifiers[0]]})
+
+        if self.split_batches:
+            return web.json_response({
+                "devices": [{"identifier": identifier, "values": values} for identifier, values in series.items()]
+            })
+
+        # Aggregated answer, as the app shows for a whole home
+        values = [
+            {"time": slot["time"], "water": None if slot["water"] is None else sum(s[i]["water"] or 0 for s in series.values())}
+            for i, slot in enumerate(next(iter(series.values()), []))
+        ]
+        return web.json_response({"values": values})
+
+    @staticmethod
+    def series(identifier: str, day: datetime) -> list[dict]:
+        """Return a deterministic 15-minute series of a device for a day, null in the future."""
+        rng = random.Random(zlib.crc32(f"{identifier}{day.date()}".encode()))
+        now = datetime.now(day.tzinfo)
+        values = []
+        for index in range(96):
+            time = day + timedelta(minutes=15 * index)
+            water = None if time > now else rng.choice((0, 0, 0, 0, 1.5, 4.0, 12.0))
+            values.append({"time": time.isoformat(), "water": water})
+        return values
+
+    async def _get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def _reset(self, request: web.Request) -> web.Response:
+        self.stats = {"requests": 0, "errors": 0, "bytes": 0, "by_endpoint": {}}
+        return web.json_response(self.stats)
+
+def urls(base: str) -> dict[str, str]:
+    """Return the API client URL overrides pointing to a stand-in."""
+    return {
+        "auth": f"{base}/v1/auth/account/token",
+        "locations": f"{base}/locations",
+        "graphql": f"{base}/v1/graphql",
+        "tsdb": f"{base}/devices/date/{{date}}",
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in of the HomeWizard cloud")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--meters", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.0, help="latency per request, in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    parser.add_argument("--aggregate-batches", action="store_true", help="answer multi-device queries with one aggregated series")
+    args = parser.parse_args()
+
+    standin = CloudStandin(args.meters, args.latency / 1000, args.error_rate, not args.aggregate_batches)
+    web.run_app(standin.app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""Import the modules of the integration without Home Assistant.
+
+The package __init__ sets up Home Assistant entries, so the HA-free modules (API
+client, fetcher, aggregation...) are loaded under a bare package instead.
+"""
+import importlib
+from pathlib import Path
+import sys
+import types
+
+PACKAGE = "homewizard_cloud_watermeter"
+PACKAGE_PATH = Path(__file__).parent.parent / "custom_components" / PACKAGE
+
+def load(name: str):
+    """Return the given module of the integration, e.g. load("api")."""
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [str(PACKAGE_PATH)]
+        sys.modules[PACKAGE] = package
+
+    return importlib.import_module(f"{PACKAGE}.{name}")
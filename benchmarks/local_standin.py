@@ -0,0 +1,70 @@
+"""Local stand-in of the local API of a USB-powered watermeter.
+
+Serves /api and /api/v1/data with a meter reading growing at a steady flow, and
+an optional error rate. Point the "local addresses" option of the integration to
+host:port of the stand-in to try the local polling.
+
+    python benchmarks/local_standin.py --port 8081 --serial 3c39e7aabbcc --flow 6
+"""
+import argparse
+import random
+import time
+
+from aiohttp import web
+
+class LocalStandin:
+    def __init__(self, serial: str, flow: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.serial = serial
+        # Liters per minute
+        self.flow = flow
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._started_at = time.monotonic()
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/api", self._device)
+        app.router.add_get("/api/v1/data", self._data)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.requests += 1
+        if self._random.random() < self.error_rate:
+            return web.Response(status=503)
+        return await handler(request)
+
+    async def _device(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "product_type": "HWE-WTR",
+            "product_name": "Watermeter",
+            "serial": self.serial,
+            "firmware_version": "2.0",
+            "api_version": "v1",
+        })
+
+    async def _data(self, request: web.Request) -> web.Response:
+        minutes = (time.monotonic() - self._started_at) / 60
+        return web.json_response({
+            "wifi_ssid": "Stand-in",
+            "wifi_strength": 80,
+            "total_liter_m3": round(100 + self.flow * minutes / 1000, 3),
+            "active_liter_lpm": self.flow,
+            "total_liter_offset_m3": 0,
+        })
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in of the local API of a watermeter")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--serial", default="3c39e7aabbcc", help="serial number, found in the cloud identifier of the meter")
+    parser.add_argument("--flow", type=float, default=0.0, help="flow, in L/min")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    standin = LocalStandin(args.serial, args.flow, args.error_rate)
+    web.run_app(standin.app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
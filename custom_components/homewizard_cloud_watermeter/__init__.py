@@ -1,36 +1,81 @@
+import asyncio
+import hashlib
 import logging
+import re
+import time
+
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.typing import ConfigType
 from homeassistant.loader import async_get_integration
 
 from .api import HomeWizardCloudApi
-from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD
+from .const import (
+    DOMAIN,
+    DATA_CLIENTS,
+    DATA_LIMITER,
+    CONF_EMAIL,
+    CONF_PASSWORD,
+    CONF_HOME_ID,
+    CONF_HOME_IDS,
+    CONF_BACKFILL_DAYS,
+    CONF_LOCAL_HOSTS,
+    CONF_MAX_CONCURRENCY,
+    DEFAULT_BACKFILL_DAYS,
+    DEFAULT_MAX_CONCURRENCY,
+    GLOBAL_MAX_CONCURRENT_REQUESTS,
+    GLOBAL_MAX_REQUESTS_PER_SECOND,
+    STARTUP_SPREAD_SECONDS,
+    STORAGE_VERSION,
+)
 from .coordinator import HomeWizardCloudDataUpdateCoordinator
+from .scheduler import GlobalRequestLimiter, entry_phase
+from .services import async_setup_services
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS: list[Platform] = [Platform.SENSOR]
+PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.BINARY_SENSOR]
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    session = async_get_clientsession(hass)
-    integration = await async_get_integration(hass, DOMAIN)
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
-    api = HomeWizardCloudApi(
-        entry.data[CONF_EMAIL],
-        entry.data[CONF_PASSWORD],
-        session,
-        integration.version
-    )
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    async_setup_services(hass)
+    return True
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    api = await _async_acquire_api(hass, entry)
 
     coordinator = HomeWizardCloudDataUpdateCoordinator(
         hass,
+        entry,
         api,
-        entry.data["home_id"]
+        entry.data.get(CONF_HOME_IDS) or [entry.data[CONF_HOME_ID]],
+        entry.options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY),
+        entry.options.get(CONF_BACKFILL_DAYS, DEFAULT_BACKFILL_DAYS),
+        _local_hosts(entry),
     )
 
-    await coordinator.async_config_entry_first_refresh()
+    try:
+        if await coordinator.async_load():
+            # Create entities from the last snapshot right away, the cloud is refreshed in the background
+            entry.async_create_background_task(
+                hass,
+                _async_delayed_refresh(coordinator, entry_phase(entry.entry_id, STARTUP_SPREAD_SECONDS)),
+                f"{DOMAIN} refresh {entry.entry_id}",
+            )
+        else:
+            await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        _release_api(hass, entry)
+        raise
+
+    if coordinator.local_coordinator is not None:
+        # Unreachable meters do not fail the setup, they use the cloud values
+        await coordinator.local_coordinator.async_refresh()
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
@@ -40,8 +85,98 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    # Resume interrupted backfills, import the history of new meters and fill restart gaps
+    coordinator.backfill.async_start([value["device"] for value in coordinator.data.values()])
+    # Resume an export interrupted by a restart
+    coordinator.export.async_resume()
+
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     return True
 
+def _local_hosts(entry: ConfigEntry) -> list[str]:
+    """Return the hosts of the meters to poll on the LAN, from the comma-separated option."""
+    return [host for host in re.split(r"[,\s]+", entry.options.get(CONF_LOCAL_HOSTS, "")) if host]
+
+async def _async_delayed_refresh(coordinator: HomeWizardCloudDataUpdateCoordinator, delay: float) -> None:
+    """Refresh after a per-entry delay, so that entries do not all hit the cloud at once on startup."""
+    await asyncio.sleep(delay)
+    await coordinator.async_refresh()
+
+async def _async_acquire_api(hass: HomeAssistant, entry: ConfigEntry) -> HomeWizardCloudApi:
+    """Get the API client shared by all entries of the same account."""
+    clients = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_CLIENTS, {})
+    limiter = hass.data[DOMAIN].setdefault(
+        DATA_LIMITER,
+        GlobalRequestLimiter(GLOBAL_MAX_CONCURRENT_REQUESTS, GLOBAL_MAX_REQUESTS_PER_SECOND),
+    )
+    key = (entry.data[CONF_EMAIL].lower(), entry.data[CONF_PASSWORD])
+
+    if key not in clients:
+        await _async_create_client(hass, entry, clients, key, limiter)
+
+    clients[key]["entries"].add(entry.entry_id)
+    return clients[key]["api"]
+
+async def _async_create_client(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    clients: dict,
+    key: tuple[str, str],
+    limiter: GlobalRequestLimiter,
+) -> None:
+    """Create the API client of an account, restoring its persisted token."""
+    integration = await async_get_integration(hass, DOMAIN)
+    store = _token_store(hass, entry)
+    stored = await store.async_load()
+
+    # Another entry of the account may have created the client while we were loading
+    if key in clients:
+        return
+
+    api = HomeWizardCloudApi(
+        entry.data[CONF_EMAIL],
+        entry.data[CONF_PASSWORD],
+        async_get_clientsession(hass),
+        integration.version,
+        limiter,
+    )
+
+    # Reuse the token of the previous run while it is still valid
+    if stored and stored.get("expires_at", 0) > time.time():
+        api.set_token(stored["token"], stored["expires_at"])
+
+    @callback
+    def _async_save_token(token: str, expires_at: float) -> None:
+        store.async_delay_save(lambda: {"token": token, "expires_at": expires_at})
+
+    api.on_token_refreshed = _async_save_token
+
+    clients[key] = {
+        "api": api,
+        "entries": set(),
+    }
+
+def _release_api(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Release the shared API client, dropping it once no entry uses it anymore."""
+    clients = hass.data[DOMAIN][DATA_CLIENTS]
+    key = (entry.data[CONF_EMAIL].lower(), entry.data[CONF_PASSWORD])
+
+    if key in clients:
+        clients[key]["api"].set_polled_meters(entry.entry_id, 0)
+        clients[key]["entries"].discard(entry.entry_id)
+        if not clients[key]["entries"]:
+            del clients[key]
+
+def _token_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Return the private store holding the bearer token of the entry account."""
+    account = hashlib.sha256(entry.data[CONF_EMAIL].lower().encode()).hexdigest()[:16]
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.token.{account}", private=True)
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry when its options are updated."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Unload all platforms (sensors, etc.)
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
@@ -49,5 +184,21 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unload_ok:
         # Clean up the memory
         hass.data[DOMAIN].pop(entry.entry_id)
+        _release_api(hass, entry)
+
+    return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    # Drop the persisted TSDB day cache, backfill progress and snapshot of the entry
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.tsdb_cache.{entry.data[CONF_HOME_ID]}").async_remove()
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.backfill.{entry.data[CONF_HOME_ID]}").async_remove()
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.snapshot.{entry.data[CONF_HOME_ID]}").async_remove()
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.export.{entry.data[CONF_HOME_ID]}").async_remove()
 
-    return unload_ok
\ No newline at end of file
+    # Drop the persisted token once the last entry of the account is removed
+    if not any(
+        other.data[CONF_EMAIL].lower() == entry.data[CONF_EMAIL].lower()
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        await _token_store(hass, entry).async_remove()
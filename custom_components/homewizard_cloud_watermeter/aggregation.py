@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+HOUR = 3600
+INTERVAL = 15 * 60
+
+class HourlyUsage:
+    """Hourly usage of a watermeter, built from its 15-minute series.
+
+    Hours are stored as UTC epoch seconds in parallel arrays, sorted, instead of a
+    dict keyed by datetime, which keeps large (backfill sized) series compact.
+    """
+
+    __slots__ = ("hours", "usage", "last_sync_at", "last_interval_usage")
+
+    def __init__(self):
+        self.hours = array("q")
+        self.usage = array("d")
+        # Time of the last 15-minute slot holding data
+        self.last_sync_at: datetime | None = None
+        # Usage of that last 15-minute slot
+        self.last_interval_usage: float | None = None
+
+    def __len__(self) -> int:
+        return len(self.hours)
+
+    def items(self):
+        """Iterate over (hour start as UTC datetime, usage) pairs, oldest first."""
+        for hour, usage in zip(self.hours, self.usage):
+            yield datetime.fromtimestamp(hour, timezone.utc), usage
+
+class UsageWindow:
+    """Usage of the recent 15-minute intervals of a watermeter, in a fixed-size ring buffer.
+
+    Interval n (epoch seconds // 900) lives at index n % capacity of parallel arrays,
+    so storing or reading an interval is O(1) and summing a window is O(window), without
+    any object per interval. Intervals older than the capacity are overwritten.
+    """
+
+    __slots__ = ("_slots", "_usage", "last_slot")
+
+    def __init__(self, hours: int):
+        capacity = hours * HOUR // INTERVAL
+        # Interval number stored at each index, -1 when empty
+        self._slots = array("q", [-1]) * capacity
+        self._usage = array("d", [0.0]) * capacity
+        self.last_slot: int | None = None
+
+    def add(self, timestamp: float, usage: float) -> None:
+        """Store the usage of the interval starting at the given time, replacing a previous value."""
+        slot = int(timestamp // INTERVAL)
+        if self.last_slot is not None and slot <= self.last_slot - len(self._slots):
+            return
+
+        index = slot % len(self._slots)
+        self._slots[index] = slot
+        self._usage[index] = usage
+
+        if self.last_slot is None or slot > self.last_slot:
+            self.last_slot = slot
+
+    def get(self, slot: int) -> float | None:
+        """Return the usage of an interval, None if it is unknown."""
+        index = slot % len(self._slots)
+        return self._usage[index] if self._slots[index] == slot else None
+
+    @property
+    def end(self) -> datetime | None:
+        """End of the last known interval."""
+        if self.last_slot is None:
+            return None
+        return datetime.fromtimestamp((self.last_slot + 1) * INTERVAL, timezone.utc)
+
+    def _window(self, duration: timedelta) -> range:
+        """Return the intervals of the duration ending with the last known one."""
+        count = min(int(duration.total_seconds() // INTERVAL), len(self._slots))
+        return range(self.last_slot - count + 1, self.last_slot + 1)
+
+    def usage(self, duration: timedelta) -> float | None:
+        """Return the usage over the duration ending with the last known interval."""
+        if self.last_slot is None:
+            return None
+        return sum(usage for usage in map(self.get, self._window(duration)) if usage is not None)
+
+    def intervals(self, duration: timedelta) -> list[tuple[datetime, float]]:
+        """Return the known (start, usage) intervals of the duration ending with the last known one."""
+        if self.last_slot is None:
+            return []
+        return [
+            (datetime.fromtimestamp(slot * INTERVAL, timezone.utc), usage)
+            for slot in self._window(duration)
+            if (usage := self.get(slot)) is not None
+        ]
+
+    def continuous_flow(self, duration: timedelta) -> bool:
+        """Return whether water flowed during every interval of the duration ending with the last known one."""
+        if self.last_slot is None:
+            return False
+        # An unknown interval may have been idle
+        return all((usage or 0) > 0 for usage in map(self.get, self._window(duration)))
+
+def aggregate_hourly(values: Iterable[dict], now: datetime, window: UsageWindow | None = None) -> HourlyUsage:
+    """Sum 15-minute usage values into hourly buckets in a single pass.
+
+    Each timestamp is parsed once, and the last sync time and the usage of the last
+    slot are tracked along the way. The intervals are also stored in the given window.
+    Values are expected in chronological order, out of order ones are still placed
+    in the right bucket.
+    """
+    result = HourlyUsage()
+    hours = result.hours
+    usage = result.usage
+
+    # Security: don't process data far in the future
+    limit = now.timestamp() + HOUR
+    last_hour = None
+    last_time = None
+    last_water = None
+
+    for entry in values:
+        water = entry.get("water")
+
+        # Ignore nulls (mainly future hours)
+        if water is None:
+            continue
+
+        try:
+            time = datetime.fromisoformat(entry["time"])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        last_time = time
+        last_water = water
+        timestamp = time.timestamp()
+        hour = int(timestamp // HOUR) * HOUR
+
+        if hour > limit:
+            continue
+
+        if window is not None:
+            window.add(timestamp, float(water))
+
+        if hour == last_hour:
+            usage[-1] += float(water)
+        elif last_hour is None or hour > last_hour:
+            hours.append(hour)
+            usage.append(float(water))
+            last_hour = hour
+        else:
+            index = bisect_left(hours, hour)
+            if index < len(hours) and hours[index] == hour:
+                usage[index] += float(water)
+            else:
+                hours.insert(index, hour)
+                usage.insert(index, float(water))
+
+    result.last_sync_at = last_time
+    result.last_interval_usage = float(last_water) if last_water is not None else None
+    return result
@@ -1,61 +1,174 @@
+import asyncio
+from collections import deque
+import contextlib
+from email.utils import parsedate_to_datetime
+import json
 import aiohttp
 import async_timeout
 import datetime
 import logging
+import random
 import time
+from typing import Callable
+
+from yarl import URL
+
+from .const import TSDB_INTERVAL_MINUTES
+from .metrics import ApiMetrics
+from .scheduler import GlobalRequestLimiter
 
 _LOGGER = logging.getLogger(__name__)
 
+# Delay applied on HTTP 429 when the response has no usable Retry-After header
+DEFAULT_RETRY_AFTER = 60
+# Attempts per request on transient errors (timeouts, 5xx, short rate limits)
+MAX_ATTEMPTS = 3
+# Base and maximum delay of the exponential backoff between attempts
+BACKOFF_BASE = 1
+BACKOFF_MAX = 30
+# Longest Retry-After we wait for inline, longer ones fail the request
+MAX_RETRY_AFTER_WAIT = 30
+# Consecutive failures opening the circuit of a host, and how long it stays open
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 300
+# Maximum number of requests sent by a client in a sliding hour, plus an allowance per
+# polled meter. A cycle without batching sends up to 2 days x MAX_ATTEMPTS requests per
+# meter, the allowance holds four such cycles so that one cannot starve the next ones
+REQUEST_BUDGET_PER_HOUR = 1000
+REQUEST_BUDGET_PER_METER_PER_HOUR = 4 * 2 * MAX_ATTEMPTS
+# Share of that budget background jobs (backfill, export) may spend, the rest is kept for the polls
+BACKGROUND_REQUEST_BUDGET_PER_HOUR = 600
+
+REQUEST_TIMEOUT = 10
+
+DEFAULT_URLS = {
+    "auth": "https://api.homewizardeasyonline.com/v1/auth/account/token",
+    "locations": "https://homes.api.homewizard.com/locations",
+    "graphql": "https://api.homewizard.energy/v1/graphql",
+    "tsdb": "https://tsdb-reader.homewizard.com/devices/date/{date}",
+}
+
+class HomeWizardCloudError(Exception):
+    """Base error of the HomeWizard Cloud API."""
+
+class HomeWizardCloudAuthError(HomeWizardCloudError):
+    """The credentials were rejected."""
+
+class HomeWizardCloudConnectionError(HomeWizardCloudError):
+    """The API could not be reached or kept failing."""
+
+class HomeWizardCloudResponseError(HomeWizardCloudError):
+    """The API answered with an unexpected HTTP status."""
+
+    def __init__(self, status: int):
+        super().__init__(f"Unexpected HTTP status {status}")
+        self.status = status
+
+class HomeWizardCloudRateLimitError(HomeWizardCloudError):
+    """The API asked to slow down for longer than we are willing to wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited for {retry_after:.0f} s")
+        self.retry_after = retry_after
+
+class HomeWizardCloudCircuitOpenError(HomeWizardCloudError):
+    """Requests to a failing host are suspended."""
+
+class HomeWizardCloudBudgetExceededError(HomeWizardCloudError):
+    """The request budget of the client is spent."""
+
+class CircuitBreaker:
+    """Suspend the requests to a host after consecutive failures.
+
+    Once open, a single trial request is let through after the reset timeout:
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+
+    def allow(self) -> bool:
+        if self._opened_at is None:
+            return True
+        if time.monotonic() - self._opened_at >= self._reset_timeout:
+            # Half-open: let one trial request through, the next ones wait for its outcome
+            self._opened_at = time.monotonic()
+            return True
+        return False
+
+    def success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+
+    def failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self._failure_threshold:
+            self._opened_at = time.monotonic()
+
 class HomeWizardCloudApi:
     """ApiClient for HomeWizard Cloud API."""
 
-    def __init__(self, username, password, session: aiohttp.ClientSession, version: str):
+    def __init__(
+        self,
+        username,
+        password,
+        session: aiohttp.ClientSession,
+        version: str,
+        limiter: GlobalRequestLimiter | None = None,
+        urls: dict[str, str] | None = None,
+    ):
         self._username = username
         self._password = password
         self._session = session
+        self._limiter = limiter
+        # Endpoints can be overridden, e.g. to run against a local stand-in of the cloud
+        self._urls = {**DEFAULT_URLS, **(urls or {})}
         self._token = None
         self._token_expires_at = 0
+        self._token_lock = asyncio.Lock()
+        self._tsdb_batch_supported = True
+        self._rate_limited_until = 0
+        self._circuit_breakers: dict[str, CircuitBreaker] = {}
+        self._request_times: deque[float] = deque()
+        self._background_request_times: deque[float] = deque()
+        # Config entry id => number of meters it polls through this client
+        self._polled_meters: dict[str, int] = {}
+        self.metrics = ApiMetrics()
+        # Called with the new token and its expiration time after each authentication
+        self.on_token_refreshed: Callable[[str, float], None] | None = None
         self._user_agent = f"HomeWizardCloudWatermeter/{version} (+https://github.com/pyrech/homewizard_cloud_watermeter)"
 
     async def async_authenticate(self) -> bool:
         """Authenticate with the Basic Auth to get a Bearer token."""
-        url = "https://api.homewizardeasyonline.com/v1/auth/account/token"
+        url = self._urls["auth"]
         auth = aiohttp.BasicAuth(self._username, self._password)
 
         try:
-            async with async_timeout.timeout(10):
-                async with self._session.get(url, auth=auth, headers={"User-Agent": self._user_agent}) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        self._token = data.get("access_token")
-                        # Store expiration time (current time + expires_in)
-                        # We subtract 60 seconds as a safety margin
-                        expires_in = data.get("expires_in", 3600)
-                        self._token_expires_at = time.time() + expires_in - 60
-                        _LOGGER.debug("Successfully authenticated to HomeWizard API. Token expires in %s s", expires_in)
-                        return True
-
-                    _LOGGER.error("Failed to authenticate to HomeWizard API, got HTTP error: %s", response.status)
-                    return False
-        except Exception as ex:
-            _LOGGER.error("Error connecting to HomeWizard API: %s", ex)
-            return False
+            data = await self._async_request("GET", url, endpoint="auth", auth=auth)
+        except HomeWizardCloudResponseError as ex:
+            if ex.status in (401, 403):
+                raise HomeWizardCloudAuthError("Invalid HomeWizard credentials") from ex
+            raise
+
+        self._token = data.get("access_token")
+        # Store expiration time (current time + expires_in)
+        # We subtract 60 seconds as a safety margin
+        expires_in = data.get("expires_in", 3600)
+        self._token_expires_at = time.time() + expires_in - 60
+        self.metrics.token_refreshes += 1
+        _LOGGER.debug("Successfully authenticated to HomeWizard API. Token expires in %s s", expires_in)
+        if self.on_token_refreshed is not None:
+            self.on_token_refreshed(self._token, self._token_expires_at)
+        return True
 
     async def async_get_locations(self) -> list:
-            """Get the list of locations associated with the account."""
-            url = "https://homes.api.homewizard.com/locations"
-            headers = await self.get_headers()
+        """Get the list of locations associated with the account."""
+        url = self._urls["locations"]
 
-            try:
-                async with async_timeout.timeout(10):
-                    async with self._session.get(url, headers=headers) as response:
-                        if response.status == 200:
-                            return await response.json()
-                        _LOGGER.error("Failed to fetch HomeWizard locations: %s", response.status)
-                        return []
-            except Exception as ex:
-                _LOGGER.error("Error fetching HomeWizard locations: %s", ex)
-                return []
+        return await self._async_request("GET", url, endpoint="locations", authorized=True)
 
     async def async_get_devices(self, home_id: int) -> dict:
         """Get the list of devices associated with the account."""
@@ -71,53 +184,281 @@ class HomeWizardCloudApi:
 
         return await self.call_graphql(payload)
 
-    async def async_get_tsdb_data(self, date: datetime, timezone: str, deviceIdentifier: str) -> dict:
+    async def async_get_device_states(self, home_id: int) -> dict:
+        """Get only the volatile fields (Wi-Fi strength, online state) of the devices of a home."""
+        payload = {
+            "operationName": "DeviceStates",
+            "variables": {
+                "homeId": home_id
+            },
+            "query": (
+                "query DeviceStates($homeId: Int!) {home(id: $homeId) { devices { identifier wifiStrength ... on CloudDevice { onlineState }}}}"
+            )
+        }
+
+        return await self.call_graphql(payload)
+
+    async def async_get_tsdb_data(
+        self, date: datetime, timezone: str, deviceIdentifier: str, background: bool = False
+    ) -> dict:
         """Fetch time-series data."""
-        url = f"https://tsdb-reader.homewizard.com/devices/date/{date.strftime("%Y/%m/%d")}"
-        headers = await self.get_headers()
+        return await self._async_post_tsdb(date, timezone, [deviceIdentifier], background)
+
+    async def async_get_tsdb_data_batch(
+        self, date: datetime, timezone: str, deviceIdentifiers: list[str], background: bool = False
+    ) -> dict:
+        """Fetch time-series data of several devices in a single request, keyed by device identifier.
+
+        Devices missing from the result could not be extracted from the batched
+        response and should be fetched one by one with async_get_tsdb_data.
+        """
+        if not deviceIdentifiers:
+            return {}
+
+        if len(deviceIdentifiers) == 1 or not self._tsdb_batch_supported:
+            # Nothing to batch, let the caller fetch devices one by one
+            return {}
+
+        try:
+            data = await self._async_post_tsdb(date, timezone, deviceIdentifiers, background)
+        except HomeWizardCloudResponseError as ex:
+            # The batched format is not documented, a rejected query will keep being rejected
+            _LOGGER.debug("HomeWizard TSDB rejected a batched query (%s), disabling batched requests.", ex)
+            self._tsdb_batch_supported = False
+            return {}
+
+        per_device = self._split_tsdb_response(data, deviceIdentifiers)
+        if not per_device:
+            # The response aggregates all devices together, stop trying to batch
+            _LOGGER.debug("HomeWizard TSDB response cannot be split per device, disabling batched requests.")
+            self._tsdb_batch_supported = False
+
+        return per_device
+
+    async def _async_post_tsdb(
+        self, date: datetime, timezone: str, deviceIdentifiers: list[str], background: bool = False
+    ) -> dict:
+        """Post a TSDB query for the given devices, counted on the background budget for background jobs."""
+        url = self._urls["tsdb"].format(date=date.strftime('%Y/%m/%d'))
 
         payload = {
             "devices": [
                 {
-                    "identifier": deviceIdentifier,
+                    "identifier": identifier,
                     "measurementType": "water"
                 }
+                for identifier in deviceIdentifiers
             ],
             "type": "water",
             "values": True,
-            "wattage": True,
-            "gb": "15m",
+            "gb": f"{TSDB_INTERVAL_MINUTES}m",
             "tz": timezone,
             "fill": "linear",
-            "three_phases": False
         }
 
-        try:
-            async with async_timeout.timeout(10):
-                async with self._session.post(url, json=payload, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    _LOGGER.error("Failed to fetch HomeWizard data: %s", response.status)
-                    return None
-        except Exception as ex:
-            _LOGGER.error("Error fetching HomeWizard data: %s", ex)
-            return None
+        return await self._async_request(
+            "POST", url, payload, endpoint="tsdb", authorized=True, background=background
+        )
+
+    @staticmethod
+    def _split_tsdb_response(data: dict, deviceIdentifiers: list[str]) -> dict:
+        """Split a multi-device TSDB response into one single-device response per identifier."""
+        per_device = {}
+
+        for device_data in data.get("devices") or []:
+            if not isinstance(device_data, dict):
+                continue
+
+            identifier = device_data.get("identifier")
+            if identifier in deviceIdentifiers and "values" in device_data:
+                per_device[identifier] = device_data
+
+        return per_device
 
     async def call_graphql(self, payload: dict) -> dict:
         """Call graphql endpoint with given payload."""
-        url = "https://api.homewizard.energy/v1/graphql"
-        headers = await self.get_headers()
+        url = self._urls["graphql"]
+
+        return await self._async_request("POST", url, payload, endpoint="graphql", authorized=True)
+
+    async def _async_request(
+        self,
+        method: str,
+        url: str,
+        payload: dict | None = None,
+        *,
+        endpoint: str,
+        auth: aiohttp.BasicAuth | None = None,
+        authorized: bool = False,
+        background: bool = False,
+    ):
+        """Send a request and return its JSON body.
+
+        Every endpoint goes through here: transient errors are retried with an
+        exponential backoff, short rate limits are waited out, a rejected token is
+        renewed once, and failing hosts are suspended by a circuit breaker.
+        `background` requests may only spend their share of the hourly budget.
+        """
+        host = URL(url).host
+        breaker = self._circuit_breakers.setdefault(host, CircuitBreaker())
+        metrics = self.metrics.endpoint(endpoint)
+        token_renewed = False
+        attempt = 0
+
+        while True:
+            if not breaker.allow():
+                raise HomeWizardCloudCircuitOpenError(f"Requests to {host} are suspended after repeated failures")
+
+            if self.rate_limited_for > MAX_RETRY_AFTER_WAIT:
+                raise HomeWizardCloudRateLimitError(self.rate_limited_for)
+            if self.rate_limited_for:
+                await asyncio.sleep(self.rate_limited_for)
+
+            self._consume_budget(background)
+
+            headers = await self.get_headers() if authorized else {"User-Agent": self._user_agent}
+            attempt += 1
+
+            try:
+                async with self._async_slot(), async_timeout.timeout(REQUEST_TIMEOUT):
+                    metrics.requests += 1
+                    sent_at = time.perf_counter()
+                    async with self._session.request(method, url, json=payload, headers=headers, auth=auth) as response:
+                        if response.status == 200:
+                            body = await response.read()
+                            metrics.bytes += len(body)
+                            data = json.loads(body)
+                            metrics.observe(time.perf_counter() - sent_at)
+                            breaker.success()
+                            return data
+
+                        body = await response.read()
+                        metrics.observe(time.perf_counter() - sent_at)
+                        metrics.bytes += len(body)
+                        metrics.errors += 1
+
+                        if response.status == 401 and authorized and not token_renewed:
+                            _LOGGER.debug("HomeWizard access token rejected, renewing...")
+                            self._invalidate_token(headers["Authorization"])
+                            token_renewed = True
+                            attempt -= 1
+                            metrics.retries += 1
+                            continue
+
+                        if response.status == 429:
+                            self._handle_rate_limit(response)
+                            if attempt < MAX_ATTEMPTS and self.rate_limited_for <= MAX_RETRY_AFTER_WAIT:
+                                metrics.retries += 1
+                                continue
+                            raise HomeWizardCloudRateLimitError(self.rate_limited_for)
+
+                        if response.status < 500:
+                            # The host is up, the request itself is wrong
+                            breaker.success()
+                            raise HomeWizardCloudResponseError(response.status)
 
+                        error = f"HTTP {response.status}"
+            except (asyncio.TimeoutError, aiohttp.ClientError, ValueError) as ex:
+                # ValueError: a body that is not valid JSON, e.g. cut short
+                metrics.errors += 1
+                error = repr(ex)
+
+            if attempt >= MAX_ATTEMPTS:
+                breaker.failure()
+                raise HomeWizardCloudConnectionError(f"Request to {host} failed after {attempt} attempts: {error}")
+
+            metrics.retries += 1
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            _LOGGER.debug("Request to %s failed (%s), retrying in %.1f s", host, error, delay)
+            await asyncio.sleep(delay)
+
+    def _async_slot(self):
+        """Return the context holding a slot of the global request limiter, if any."""
+        if self._limiter is None:
+            return contextlib.nullcontext()
+        return self._limiter.acquire()
+
+    def _consume_budget(self, background: bool = False) -> None:
+        """Count a request against the hourly budget of the client."""
+        now = self._prune_budget()
+
+        if len(self._request_times) >= self.request_budget:
+            raise HomeWizardCloudBudgetExceededError(f"More than {self.request_budget} requests sent in the last hour")
+        if background and len(self._background_request_times) >= BACKGROUND_REQUEST_BUDGET_PER_HOUR:
+            raise HomeWizardCloudBudgetExceededError(
+                f"More than {BACKGROUND_REQUEST_BUDGET_PER_HOUR} background requests sent in the last hour"
+            )
+
+        self._request_times.append(now)
+        if background:
+            self._background_request_times.append(now)
+
+    def _prune_budget(self) -> float:
+        """Forget the requests older than an hour, return the current time."""
+        now = time.monotonic()
+        for request_times in (self._request_times, self._background_request_times):
+            while request_times and now - request_times[0] > 3600:
+                request_times.popleft()
+        return now
+
+    def set_polled_meters(self, entry_id: str, count: int) -> None:
+        """Record how many meters an entry polls, which the hourly budget grows with."""
+        if count:
+            self._polled_meters[entry_id] = count
+        else:
+            self._polled_meters.pop(entry_id, None)
+
+    @property
+    def request_budget(self) -> int:
+        """Number of requests the client may send in a sliding hour."""
+        return REQUEST_BUDGET_PER_HOUR + REQUEST_BUDGET_PER_METER_PER_HOUR * sum(self._polled_meters.values())
+
+    @property
+    def background_budget_wait(self) -> float:
+        """Number of seconds before background jobs may send a request again."""
+        now = self._prune_budget()
+        wait = 0.0
+
+        for request_times, budget in (
+            (self._request_times, self.request_budget),
+            (self._background_request_times, BACKGROUND_REQUEST_BUDGET_PER_HOUR),
+        ):
+            if len(request_times) >= budget:
+                wait = max(wait, 3600 - (now - request_times[len(request_times) - budget]))
+
+        return wait
+
+    def set_token(self, token: str, expires_at: float) -> None:
+        """Reuse a token obtained earlier, e.g. persisted before a restart."""
+        self._token = token
+        self._token_expires_at = expires_at
+
+    def _invalidate_token(self, authorization: str) -> None:
+        """Forget the token, unless it was already renewed since the rejected request."""
+        if authorization == f"Bearer {self._token}":
+            self._token = None
+            self._token_expires_at = 0
+
+    @property
+    def rate_limited_for(self) -> float:
+        """Number of seconds to wait before the API accepts requests again."""
+        return max(0.0, self._rate_limited_until - time.time())
+
+    def _handle_rate_limit(self, response: aiohttp.ClientResponse) -> None:
+        """Remember until when the API asked us to stop sending requests."""
+        retry_after = response.headers.get("Retry-After")
         try:
-            async with async_timeout.timeout(10):
-                async with self._session.post(url, json=payload, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    _LOGGER.error("Failed to fetch HomeWizard data: %s", response.status)
-                    return None
-        except Exception as ex:
-            _LOGGER.error("Error fetching HomeWizard data: %s", ex)
-            return None
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            # Retry-After may also be an HTTP date
+            try:
+                delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = DEFAULT_RETRY_AFTER
+        delay = max(0.0, delay)
+        self._rate_limited_until = max(self._rate_limited_until, time.time() + delay)
+        _LOGGER.warning("HomeWizard API is rate limiting requests, pausing for %s s", delay)
 
     async def get_headers(self) -> dict:
         """Get headers for GraphQL/API requests."""
@@ -130,7 +471,15 @@ class HomeWizardCloudApi:
 
     async def async_ensure_token(self) -> str:
         """Check if token is valid and renew it if necessary."""
-        if not self._token or time.time() > self._token_expires_at:
-            _LOGGER.debug("HomeWizard access token expired or missing, renewing...")
-            await self.async_authenticate()
+        if self._token_is_valid():
+            return self._token
+
+        # Single flight: concurrent callers wait for the renewal already in progress
+        async with self._token_lock:
+            if not self._token_is_valid():
+                _LOGGER.debug("HomeWizard access token expired or missing, renewing...")
+                await self.async_authenticate()
         return self._token
+
+    def _token_is_valid(self) -> bool:
+        return bool(self._token) and time.time() <= self._token_expires_at
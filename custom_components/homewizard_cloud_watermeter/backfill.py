@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData
+from homeassistant.components.recorder.statistics import async_add_external_statistics, statistic_during_period
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+
+from .aggregation import aggregate_hourly
+from .const import (
+    DOMAIN,
+    STORAGE_VERSION,
+    BACKFILL_CHUNK_DAYS,
+    MAX_BACKFILL_DAYS,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import HomeWizardCloudDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+class HomeWizardCloudBackfill:
+    """Import the history of watermeters into their external statistic.
+
+    Days are fetched oldest first, by chunks, and each chunk is imported in a single
+    batch carrying on the cumulative sum of the previous one. The next day to fetch
+    and the running sum are persisted after each chunk so that an interrupted backfill
+    resumes where it stopped.
+    """
+
+    def __init__(self, coordinator: HomeWizardCloudDataUpdateCoordinator):
+        self._coordinator = coordinator
+        self._hass = coordinator.hass
+        self._store = Store(self._hass, STORAGE_VERSION, f"{DOMAIN}.backfill.{coordinator.home_id}")
+        # Statistic id => {"next_day": ISO date, "sum": running cumulative sum}
+        self._progress: dict[str, dict] = {}
+        # Statistic ids whose history was already backfilled once
+        self._known: set[str] = set()
+        # Statistic id => start of the last hour recorded before the first import of this run
+        self._last_before_startup: dict[str, datetime] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def async_load(self) -> None:
+        stored = await self._store.async_load()
+        if stored:
+            self._progress = stored.get("progress", {})
+            self._known = set(stored.get("known", []))
+
+        # Read before the first regular import, which writes yesterday and today on top
+        # of the last recorded hour and would hide a gap left while Home Assistant was down
+        known = sorted(self._known - set(self._progress))
+        if not known:
+            return
+        try:
+            last_statistics = await self._coordinator.async_get_last_statistics(known)
+        except Exception as ex:
+            _LOGGER.warning("Cannot read the last HomeWizard statistics, restart gaps will not be filled: %s", ex)
+            return
+        self._last_before_startup = {
+            statistic_id: last_stat_time
+            for statistic_id, (_last_sum, last_stat_time) in last_statistics.items()
+            if last_stat_time is not None
+        }
+
+    def async_start(self, devices: list, days: int | None = None) -> None:
+        """Start a backfill in the background.
+
+        Without `days`, only what is needed is backfilled: interrupted backfills are
+        resumed, new meters get their configured history and gaps left while Home
+        Assistant was down are filled.
+        """
+        if self.running:
+            _LOGGER.info("A HomeWizard backfill is already running, ignoring request.")
+            return
+
+        self._task = self._coordinator.config_entry.async_create_background_task(
+            self._hass,
+            self.async_run(devices, days),
+            f"{DOMAIN} backfill {self._coordinator.home_id}",
+        )
+
+    async def async_run(self, devices: list, days: int | None = None) -> None:
+        """Backfill the given watermeters, one after the other."""
+        today = dt_util.now().date()
+
+        for device in devices:
+            statistic_id = self._coordinator.statistic_id(device)
+
+            try:
+                async with self._coordinator.stats_lock(statistic_id):
+                    plan = await self._async_plan(statistic_id, today, days)
+
+                if plan is None:
+                    self._last_before_startup.pop(statistic_id, None)
+                    self._known.add(statistic_id)
+                    await self._async_save()
+                    continue
+
+                start_day, start_sum = plan
+                await self._async_backfill_device(device, start_day, today, start_sum)
+                self._last_before_startup.pop(statistic_id, None)
+            except Exception as ex:
+                _LOGGER.error("Error while backfilling HomeWizard watermeter '%s': %s", device["identifier"], ex)
+
+    async def _async_plan(self, statistic_id: str, today: date, days: int | None) -> tuple[date, float] | None:
+        """Return the first day to backfill and the sum before it, or None if nothing is needed."""
+        if days is None and statistic_id in self._progress:
+            progress = self._progress[statistic_id]
+            _LOGGER.debug("Resuming HomeWizard backfill of '%s' from %s", statistic_id, progress["next_day"])
+            return date.fromisoformat(progress["next_day"]), progress["sum"]
+
+        # Let pending imports land so that the sums read below are consistent
+        await get_instance(self._hass).async_block_till_done()
+
+        last_sum, last_stat_time = await self._coordinator.async_get_last_statistic(statistic_id)
+        oldest_day = today - timedelta(days=min(days or self._coordinator.backfill_days, MAX_BACKFILL_DAYS))
+
+        if days is not None:
+            start_day = oldest_day
+        elif statistic_id not in self._known or last_stat_time is None:
+            # New meter, import its configured history
+            start_day = oldest_day
+        else:
+            # The regular update covers yesterday and today, only older gaps need a backfill.
+            # The first import may already have run, the gap starts where the recorder stood before it
+            last_known = self._last_before_startup.get(statistic_id, last_stat_time)
+            start_day = max(oldest_day, dt_util.as_local(min(last_known, last_stat_time)).date())
+            if start_day >= today - timedelta(days=1):
+                return None
+
+        if last_stat_time is None:
+            return start_day, 0.0
+
+        # Anchor the rewritten range on the sum recorded just before it
+        change = await get_instance(self._hass).async_add_executor_job(
+            statistic_during_period,
+            self._hass,
+            dt_util.start_of_local_day(start_day),
+            None,
+            statistic_id,
+            {"change"},
+            None,
+        )
+        return start_day, last_sum - (change.get("change") or 0.0)
+
+    async def _async_backfill_device(self, device: dict, start_day: date, end_day: date, cumulative_sum: float) -> None:
+        """Fetch and import the days of a watermeter from start_day up to end_day."""
+        statistic_id = self._coordinator.statistic_id(device)
+        metadata = self._coordinator.statistic_metadata(device)
+        days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+
+        _LOGGER.info("Backfilling HomeWizard watermeter '%s' from %s", device["identifier"], start_day)
+
+        for index in range(0, len(days), BACKFILL_CHUNK_DAYS):
+            chunk = days[index:index + BACKFILL_CHUNK_DAYS]
+
+            # The coordinator semaphore bounds the number of days fetched in parallel
+            results = await asyncio.gather(
+                *(self._coordinator.async_fetch_history_day(day, [device]) for day in chunk)
+            )
+
+            stat_data = []
+            now = dt_util.now()
+            for day, result in zip(chunk, results):
+                result = result.get(device["identifier"])
+                if result is None:
+                    _LOGGER.warning(
+                        "Could not fetch %s for HomeWizard watermeter '%s', backfill will resume later",
+                        day,
+                        device["identifier"],
+                    )
+                    return
+
+                hourly = aggregate_hourly(result.get("values", []), now)
+                for hour, usage in hourly.items():
+                    # Ignore hours without water usage
+                    if usage == 0:
+                        continue
+
+                    cumulative_sum += usage
+                    stat_data.append(StatisticData(start=hour, state=usage, sum=cumulative_sum))
+
+            async with self._coordinator.stats_lock(statistic_id):
+                if stat_data:
+                    async_add_external_statistics(self._hass, metadata, stat_data)
+                    # Make sure the chunk is committed before the next regular import reads it back
+                    await get_instance(self._hass).async_block_till_done()
+
+                if chunk[-1] >= end_day:
+                    # The last chunk rewrote the most recent hours, the regular import continues from it
+                    if stat_data:
+                        self._coordinator.set_cursor(statistic_id, cumulative_sum, dt_util.as_utc(stat_data[-1]["start"]))
+                    else:
+                        self._coordinator.invalidate_cursor(statistic_id)
+
+            next_day = chunk[-1] + timedelta(days=1)
+            if next_day > end_day:
+                self._progress.pop(statistic_id, None)
+                self._known.add(statistic_id)
+            else:
+                self._progress[statistic_id] = {"next_day": next_day.isoformat(), "sum": cumulative_sum}
+            await self._async_save()
+
+        _LOGGER.info("Backfill of HomeWizard watermeter '%s' completed", device["identifier"])
+
+    async def _async_save(self) -> None:
+        await self._store.async_save({"progress": self._progress, "known": sorted(self._known)})
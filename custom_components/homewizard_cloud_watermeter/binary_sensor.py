@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass, BinarySensorEntity
+from homeassistant.core import callback
+
+from .const import DOMAIN, LEAK_FLOW_HOURS
+from .entity import HomeWizardDeviceEntity
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    known_devices = set()
+
+    @callback
+    def _async_add_devices():
+        """Create the binary sensors of new devices, the sensor platform removes the gone ones."""
+        entities = []
+
+        for identifier, value in (coordinator.data or {}).items():
+            if identifier in known_devices:
+                continue
+
+            known_devices.add(identifier)
+            entities.append(HomeWizardContinuousFlowSensor(coordinator, value))
+
+        known_devices.intersection_update(coordinator.data or {})
+
+        if entities:
+            async_add_entities(entities)
+
+    _async_add_devices()
+    entry.async_on_unload(coordinator.async_add_listener(_async_add_devices))
+
+class HomeWizardContinuousFlowSensor(HomeWizardDeviceEntity, BinarySensorEntity):
+    """Water flowing during every 15-minute interval of the last hours, a sign of a leak."""
+
+    def __init__(self, coordinator, data):
+        super().__init__(coordinator, data)
+
+        self._duration = timedelta(hours=LEAK_FLOW_HOURS)
+        self._attr_name = "Continuous Flow"
+        self._attr_unique_id = f"{self._sanitized_identifier}_continuous_flow"
+        self._attr_device_class = BinarySensorDeviceClass.PROBLEM
+        self._attr_icon = "mdi:pipe-leak"
+
+    @property
+    def is_on(self):
+        window = self.coordinator.windows.get(self._sanitized_identifier)
+        return window.continuous_flow(self._duration) if window is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        window = self.coordinator.windows.get(self._sanitized_identifier)
+        return {
+            "duration_hours": LEAK_FLOW_HOURS,
+            "window_end": window.end if window is not None else None,
+        }
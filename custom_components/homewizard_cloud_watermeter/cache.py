@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+import logging
+from typing import TYPE_CHECKING
+
+from .const import DAY_CACHE_MAX_DAYS, DAY_CACHE_SETTLE_DELAY_HOURS
+
+if TYPE_CHECKING:
+    from homeassistant.helpers.storage import Store
+
+_LOGGER = logging.getLogger(__name__)
+
+SAVE_DELAY = 30
+
+class TsdbDayCache:
+    """Cache of TSDB responses for days that are over and will not change anymore."""
+
+    def __init__(self, store: Store | None = None, max_days: int = DAY_CACHE_MAX_DAYS):
+        self._store = store
+        self._max_days = max_days
+        # Day (ISO format) => device identifier => TSDB response
+        self._days: dict[str, dict[str, dict]] = {}
+
+    async def async_load(self) -> None:
+        """Load the persisted days, if persistence is enabled."""
+        if self._store is None:
+            return
+
+        stored = await self._store.async_load()
+        if stored:
+            self._days = stored.get("days", {})
+            self._evict()
+            _LOGGER.debug("Loaded %s cached HomeWizard TSDB days", len(self._days))
+
+    def get(self, day: date, identifier: str) -> dict | None:
+        """Return the cached response of a device for a completed day."""
+        return self._days.get(day.isoformat(), {}).get(identifier)
+
+    def set(self, day: date, identifier: str, data: dict) -> None:
+        """Cache the response of a device for a completed day."""
+        self._days.setdefault(day.isoformat(), {})[identifier] = data
+        self._evict()
+
+        if self._store is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @staticmethod
+    def is_complete(day: date, data: dict, now: datetime) -> bool:
+        """Whether a response fetched at `now` holds the final data of the day.
+
+        A day is complete once it is over and the device uploaded data up to its last
+        slot. A device that stays silent can still upload late, so an incomplete day
+        is only considered final after a settle delay.
+        """
+        if day >= now.date():
+            return False
+
+        values = data.get("values") or []
+        if values and values[-1].get("water") is not None:
+            return True
+
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        return now >= day_end + timedelta(hours=DAY_CACHE_SETTLE_DELAY_HOURS)
+
+    def _evict(self) -> None:
+        """Drop the oldest days above the configured maximum."""
+        for day in sorted(self._days)[:-self._max_days or None]:
+            del self._days[day]
+
+    def _data_to_save(self) -> dict:
+        return {"days": self._days}
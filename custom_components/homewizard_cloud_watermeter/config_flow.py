@@ -2,12 +2,26 @@ import logging
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.core import callback
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.loader import async_get_integration
 import homeassistant.helpers.config_validation as cv
 
-from .api import HomeWizardCloudApi
-from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD, CONF_LOCATION_ID
+from .api import HomeWizardCloudApi, HomeWizardCloudAuthError, HomeWizardCloudError
+from .const import (
+    DOMAIN,
+    CONF_EMAIL,
+    CONF_PASSWORD,
+    CONF_LOCATION_ID,
+    CONF_HOME_ID,
+    CONF_HOME_IDS,
+    CONF_BACKFILL_DAYS,
+    CONF_LOCAL_HOSTS,
+    CONF_MAX_CONCURRENCY,
+    DEFAULT_BACKFILL_DAYS,
+    DEFAULT_MAX_CONCURRENCY,
+    MAX_BACKFILL_DAYS,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,6 +34,13 @@ class HomeWizardCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         # We store credentials and locations in the flow instance to pass between steps
         self._data = {}
         self._locations = {}
+        self._api = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return HomeWizardCloudOptionsFlow()
 
     async def async_step_user(self, user_input=None):
         """Handle the initial step: Login."""
@@ -37,12 +58,18 @@ class HomeWizardCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 integration.version,
             )
 
-            if await api.async_authenticate():
+            try:
+                await api.async_authenticate()
+            except HomeWizardCloudAuthError:
+                errors["base"] = "invalid_auth"
+            except HomeWizardCloudError:
+                errors["base"] = "cannot_connect"
+            else:
                 self._data.update(user_input)
+                # Keep the authenticated client for the next steps
+                self._api = api
                 # Success: go to location selection
                 return await self.async_step_location()
-            else:
-                errors["base"] = "invalid_auth"
 
         # Form schema for the UI
         return self.async_show_form(
@@ -58,46 +85,70 @@ class HomeWizardCloudConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle the second step: Select Location."""
         errors = {}
 
-        # We need the API again to fetch locations or validate
-        session = async_get_clientsession(self.hass)
-        integration = await async_get_integration(self.hass, DOMAIN)
-        api = HomeWizardCloudApi(
-            self._data[CONF_EMAIL],
-            self._data[CONF_PASSWORD],
-            session,
-            integration.version,
-        )
-
         if user_input is not None:
-            location_id = user_input[CONF_LOCATION_ID]
-            location_name = self._locations[location_id]
+            # The options are keyed by strings, the GraphQL API expects integer home ids
+            location_ids = sorted(int(location_id) for location_id in user_input[CONF_LOCATION_ID])
 
-            # Use location_id as unique ID to allow multiple instances (one per home)
-            await self.async_set_unique_id(str(location_id))
+            # Use the location ids as unique ID to allow multiple instances (one per set of homes)
+            await self.async_set_unique_id(",".join(str(location_id) for location_id in location_ids))
             self._abort_if_unique_id_configured()
 
+            # A home must not be polled by two entries
+            for entry in self._async_current_entries():
+                if set(entry.data.get(CONF_HOME_IDS) or [entry.data[CONF_HOME_ID]]) & set(location_ids):
+                    return self.async_abort(reason="already_configured")
+
             return self.async_create_entry(
-                title=location_name,
-                data={**self._data, "home_id": location_id}
+                title=", ".join(self._locations[str(location_id)] for location_id in location_ids),
+                data={**self._data, CONF_HOME_ID: location_ids[0], CONF_HOME_IDS: location_ids}
             )
 
-        # Re-authenticate to ensure token is fresh for fetching locations
-        await api.async_authenticate()
+        # Fetch locations from API, the token is renewed if it expired in the meantime
+        try:
+            locations_data = await self._api.async_get_locations()
+        except HomeWizardCloudError:
+            return self.async_abort(reason="cannot_connect")
 
-        # Fetch locations from API
-        locations_data = await api.async_get_locations()
         if not locations_data:
             return self.async_abort(reason="no_locations")
 
+        # Keyed by string: the options reach the frontend as a JSON object and come back as strings
         self._locations = {
-            loc["id"]: f"{loc.get('name', 'Home')} ({loc.get('location', 'No address')})"
+            str(loc["id"]): f"{loc.get('name', 'Home')} ({loc.get('location', 'No address')})"
             for loc in locations_data
         }
 
         return self.async_show_form(
             step_id="location",
             data_schema=vol.Schema({
-                vol.Required(CONF_LOCATION_ID): vol.In(self._locations),
+                vol.Required(CONF_LOCATION_ID): vol.All(cv.multi_select(self._locations), vol.Length(min=1)),
             }),
             errors=errors,
         )
+
+
+class HomeWizardCloudOptionsFlow(config_entries.OptionsFlow):
+    """Handle options for HomeWizard Cloud Watermeter."""
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Required(
+                    CONF_MAX_CONCURRENCY,
+                    default=self.config_entry.options.get(CONF_MAX_CONCURRENCY, DEFAULT_MAX_CONCURRENCY),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+                vol.Required(
+                    CONF_BACKFILL_DAYS,
+                    default=self.config_entry.options.get(CONF_BACKFILL_DAYS, DEFAULT_BACKFILL_DAYS),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_BACKFILL_DAYS)),
+                vol.Optional(
+                    CONF_LOCAL_HOSTS,
+                    default=self.config_entry.options.get(CONF_LOCAL_HOSTS, ""),
+                ): cv.string,
+            }),
+        )
@@ -1,4 +1,97 @@
 DOMAIN = "homewizard_cloud_watermeter"
+
+# Key of the API clients shared between entries of the same account in hass.data[DOMAIN]
+DATA_CLIENTS = "clients"
+# Key of the request limiter shared by all API clients in hass.data[DOMAIN]
+DATA_LIMITER = "limiter"
+
 CONF_EMAIL = "email"
 CONF_PASSWORD = "password"
 CONF_LOCATION_ID = "location_id"
+# Homes polled by an entry, the first one also names its persisted stores
+CONF_HOME_ID = "home_id"
+CONF_HOME_IDS = "home_ids"
+CONF_MAX_CONCURRENCY = "max_concurrency"
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+STORAGE_VERSION = 1
+
+# Number of completed days kept in the TSDB day cache
+DAY_CACHE_MAX_DAYS = 7
+# A completed day without data up to its last slot is cached anyway after this delay
+DAY_CACHE_SETTLE_DELAY_HOURS = 24
+
+CONF_BACKFILL_DAYS = "backfill_days"
+
+DEFAULT_BACKFILL_DAYS = 30
+MAX_BACKFILL_DAYS = 365
+# Number of days fetched and imported together during a backfill
+BACKFILL_CHUNK_DAYS = 7
+# Attempts per past day before a backfill or an export gives up (and resumes later)
+HISTORY_MAX_ATTEMPTS = 3
+# Delay between two attempts of a failed day when the API gave no Retry-After
+HISTORY_RETRY_DELAY_SECONDS = 30
+
+SERVICE_BACKFILL = "backfill"
+ATTR_DAYS = "days"
+
+# How long the device list is trusted before it is fetched again
+DEVICE_LIST_TTL_HOURS = 6
+# In between, only the volatile Wi-Fi strength and online state are refreshed, at this cadence
+DEVICE_STATE_INTERVAL_MINUTES = 60
+
+# Polling cadence, adapted to the upload cadence of the devices
+DEFAULT_UPDATE_INTERVAL_MINUTES = 60
+MIN_UPDATE_INTERVAL_MINUTES = 5
+MAX_UPDATE_INTERVAL_MINUTES = 360
+# Number of device syncs used to learn their cadence
+SYNC_HISTORY_SIZE = 8
+# Delay between the expected end of an upload and the poll fetching it
+SYNC_MARGIN_MINUTES = 20
+
+# Global ceiling on the HTTP calls of all entries together
+GLOBAL_MAX_CONCURRENT_REQUESTS = 8
+GLOBAL_MAX_REQUESTS_PER_SECOND = 5
+# Polls of the different entries are spread over slots of this length
+POLL_SPREAD_MINUTES = 15
+# Smaller spread of the polls planned right after a predicted device upload
+PREDICTED_POLL_SPREAD_MINUTES = 2
+# The first refresh after a restart is spread over this delay
+STARTUP_SPREAD_SECONDS = 120
+
+# Resolution of the TSDB series, in minutes
+TSDB_INTERVAL_MINUTES = 15
+
+# Update cycles lasting longer are traced at debug level
+SLOW_CYCLE_SECONDS = 30
+
+# Recorded statistics are compared with the cloud series this often, over this many past days
+RECONCILE_INTERVAL_HOURS = 6
+RECONCILE_DAYS = 7
+
+# Hosts of meters reachable over the LAN, polled for live values
+CONF_LOCAL_HOSTS = "local_hosts"
+LOCAL_UPDATE_INTERVAL_SECONDS = 5
+# Consecutive failures after which a meter is given up on the LAN, and for how long
+LOCAL_MAX_FAILURES = 3
+LOCAL_RETRY_MINUTES = 5
+
+# Recent 15-minute intervals kept in memory per meter
+USAGE_WINDOW_HOURS = 48
+# Flow without a single idle interval for this long is reported as a possible leak
+LEAK_FLOW_HOURS = 6
+
+SERVICE_GET_USAGE = "get_usage"
+ATTR_HOURS = "hours"
+ATTR_DEVICE_ID = "device_id"
+
+# Number of days fetched together, then written to the files, during an export
+EXPORT_CHUNK_DAYS = 7
+EXPORT_FORMAT_CSV = "csv"
+EXPORT_FORMAT_PARQUET = "parquet"
+
+SERVICE_EXPORT = "export"
+ATTR_START_DATE = "start_date"
+ATTR_END_DATE = "end_date"
+ATTR_FORMAT = "format"
@@ -1,4 +1,7 @@
-from datetime import timedelta, datetime
+import asyncio
+import contextlib
+from datetime import date, timedelta, datetime
+from itertools import chain
 import logging
 
 from homeassistant.components.recorder import get_instance
@@ -9,154 +12,614 @@ from homeassistant.components.recorder.models import (
 )
 from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
 from homeassistant.components.sensor import SensorDeviceClass
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.util import dt as dt_util
 from homeassistant.const import UnitOfVolume
 
-from .const import DOMAIN
-from .api import HomeWizardCloudApi
+from .const import (
+    DOMAIN,
+    DEFAULT_BACKFILL_DAYS,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_UPDATE_INTERVAL_MINUTES,
+    DEVICE_LIST_TTL_HOURS,
+    DEVICE_STATE_INTERVAL_MINUTES,
+    HISTORY_MAX_ATTEMPTS,
+    HISTORY_RETRY_DELAY_SECONDS,
+    LOCAL_MAX_FAILURES,
+    LOCAL_RETRY_MINUTES,
+    LOCAL_UPDATE_INTERVAL_SECONDS,
+    MAX_UPDATE_INTERVAL_MINUTES,
+    POLL_SPREAD_MINUTES,
+    PREDICTED_POLL_SPREAD_MINUTES,
+    SLOW_CYCLE_SECONDS,
+    STORAGE_VERSION,
+    USAGE_WINDOW_HOURS,
+)
+from .aggregation import HourlyUsage, UsageWindow, aggregate_hourly
+from .api import HomeWizardCloudApi, HomeWizardCloudBudgetExceededError, HomeWizardCloudError
+from .backfill import HomeWizardCloudBackfill
+from .cache import TsdbDayCache
+from .export import HomeWizardCloudExport
+from .fetcher import TsdbFetcher
+from .local_api import HomeWizardLocalApi, HomeWizardLocalError
+from .metrics import CycleTimings
+from .reconcile import HomeWizardCloudReconciler
+from .scheduler import SyncCadenceScheduler, align_to_phase, entry_phase
 
 _LOGGER = logging.getLogger(__name__)
 
-class HomeWizardCloudDataUpdateCoordinator(DataUpdateCoordinator):
-    def __init__(self, hass, api: HomeWizardCloudApi, home_id: int):
+SNAPSHOT_SAVE_DELAY = 10
+
+class HomeWizardCloudDeviceListCoordinator(DataUpdateCoordinator):
+    """Keep the list of watermeters of the homes of an entry.
+
+    The device inventory almost never changes, so it is listed again on a slow cadence
+    and can be invalidated explicitly when it looks outdated. In between, a light query
+    only refreshes the Wi-Fi strength and online state of the known devices.
+    """
+
+    def __init__(self, hass, config_entry, api: HomeWizardCloudApi, home_ids: list[int]):
         self.api = api
-        self.home_id = home_id
-        self._pending_stats = None
+        self.home_ids = home_ids
+        # When the full device list was last fetched
+        self._listed_at: datetime | None = None
         super().__init__(
             hass,
             _LOGGER,
-            name=DOMAIN,
-            update_interval=timedelta(minutes=60),
+            config_entry=config_entry,
+            name=f"{DOMAIN} devices",
+            update_interval=timedelta(minutes=DEVICE_STATE_INTERVAL_MINUTES),
         )
 
+    @callback
+    def async_invalidate(self) -> None:
+        """Fetch the device list again on the next consumption update."""
+        self.data = None
+        self._listed_at = None
+
     async def _async_update_data(self):
-        if "recorder" not in self.hass.config.components:
-            _LOGGER.debug("Recorder not loaded, skipping update.")
-            return {}
+        now = dt_util.utcnow()
+        if (
+            self.data is not None
+            and self._listed_at is not None
+            and now - self._listed_at < timedelta(hours=DEVICE_LIST_TTL_HOURS)
+        ):
+            return await self._async_update_states()
+
+        watermeters = await self._async_list_devices()
+        self._listed_at = now
+        return watermeters
+
+    async def _async_query_homes(self, query) -> list[tuple[int, list]]:
+        """Run a GraphQL device query on every home, return the devices of each home."""
+        # All homes at once, a partial list would remove the meters of the failing homes
+        try:
+            homes_data = await asyncio.gather(*(query(home_id) for home_id in self.home_ids))
+        except HomeWizardCloudError as ex:
+            raise UpdateFailed(f"Error fetching HomeWizard devices: {ex}") from ex
+
+        homes = []
+
+        for home_id, devices_data in zip(self.home_ids, homes_data):
+            if not devices_data:
+                raise UpdateFailed(f"Error fetching HomeWizard devices.")
+
+            if "errors" in devices_data:
+                raise UpdateFailed(f"Error fetching HomeWizard devices: {devices_data.get('errors')}")
+
+            homes.append((home_id, devices_data.get("data", {}).get("home", {}).get("devices", [])))
+
+        return homes
+
+    async def _async_update_states(self) -> list:
+        """Refresh the volatile fields of the known watermeters."""
+        states = {
+            device.get("identifier"): device
+            for _home_id, devices in await self._async_query_homes(self.api.async_get_device_states)
+            for device in devices
+        }
+
+        return [
+            {
+                **device,
+                **{
+                    field: states[device["identifier"]][field]
+                    for field in ("wifiStrength", "onlineState")
+                    if field in states.get(device["identifier"], {})
+                },
+            }
+            for device in self.data
+        ]
+
+    async def _async_list_devices(self) -> list:
+        """Fetch the full list of watermeters."""
+        watermeters = []
+
+        for home_id, devices in await self._async_query_homes(self.api.async_get_devices):
+            for device in devices:
+                if device.get("type") == "watermeter":
+                    watermeters.append({**device, "home_id": home_id})
+
+        for device in watermeters:
+            _LOGGER.debug("Found HomeWizard watermeter device '%s' in home %s.", device["identifier"], device["home_id"])
 
-        devices_data = await self.api.async_get_devices(self.home_id)
-        if not devices_data:
-            raise UpdateFailed(f"Error fetching HomeWizard devices.")
+            # Sanitize the identifier for Home Assistant's use
+            # This will be used for statistic_id, unique_id, and device_id
+            device['sanitized_identifier'] = device["identifier"].replace('/', '_')
 
-        if "errors" in devices_data:
-            raise UpdateFailed(f"Error fetching HomeWizard devices: {devices_data.get('errors')}")
+        return watermeters
 
-        devices = devices_data.get("data", {}).get("home", {}).get("devices", [])
+class HomeWizardLocalCoordinator(DataUpdateCoordinator):
+    """Poll the meters reachable on the LAN for live values.
 
-        now = dt_util.now()
-        yesterday = now - timedelta(days=1)
+    The cloud stays the source of the statistics, this only feeds live sensors. Each
+    host is matched to a watermeter of the home by its serial number. A host failing
+    repeatedly is left alone for a few minutes, its meter falls back to the cloud values.
+    """
 
-        data = {}
+    def __init__(self, hass, config_entry, hosts: list[str], device_coordinator: HomeWizardCloudDeviceListCoordinator):
+        session = async_get_clientsession(hass)
+        self._clients = [HomeWizardLocalApi(host, session) for host in hosts]
+        self._device_coordinator = device_coordinator
+        # Host => sanitized identifier of its watermeter
+        self._devices: dict[str, str] = {}
+        self._failures: dict[str, int] = {}
+        self._suspended_until: dict[str, datetime] = {}
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=f"{DOMAIN} local",
+            update_interval=timedelta(seconds=LOCAL_UPDATE_INTERVAL_SECONDS),
+        )
+
+    async def _async_update_data(self):
+        now = dt_util.utcnow()
+        clients = [
+            client for client in self._clients
+            if client.host not in self._suspended_until or self._suspended_until[client.host] <= now
+        ]
+
+        results = await asyncio.gather(*(self._async_poll(client) for client in clients), return_exceptions=True)
 
-        # Find watermeter devices and fetch their data
-        for device in devices:
-            if device.get("type") != "watermeter":
+        data = {}
+        for client, result in zip(clients, results):
+            if isinstance(result, HomeWizardLocalError):
+                self._failed(client.host, result, now)
                 continue
+            if isinstance(result, Exception):
+                raise result
 
-            _LOGGER.debug("Found HomeWizard watermeter device '%s', fetching data.", device["identifier"])
+            if self._failures.pop(client.host, 0) >= LOCAL_MAX_FAILURES:
+                _LOGGER.info("HomeWizard watermeter at %s is reachable again on the LAN", client.host)
+            self._suspended_until.pop(client.host, None)
 
-            # Sanitize the identifier for Home Assistant's use
-            # This will be used for statistic_id, unique_id, and device_id
-            device['sanitized_identifier'] = device["identifier"].replace('/', '_')
+            if result is not None:
+                identifier, values = result
+                data[identifier] = values
 
-            # Retrieve device data
-            stats_today = await self.api.async_get_tsdb_data(now, self.hass.config.time_zone, device["identifier"])
-            stats_yesterday = await self.api.async_get_tsdb_data(yesterday, self.hass.config.time_zone, device["identifier"])
+        # Never fail: meters missing here simply use the cloud values
+        return data
 
-            if not stats_today or "values" not in stats_today:
-                _LOGGER.warning("No data received for watermeter device.")
-                continue
+    @property
+    def matched_identifiers(self) -> set[str]:
+        """Sanitized identifiers of the watermeters matched to a LAN host so far."""
+        return set(self._devices.values())
+
+    async def _async_poll(self, client: HomeWizardLocalApi) -> tuple[str, dict] | None:
+        """Read the live values of a meter, return them with the identifier of its watermeter."""
+        identifier = self._devices.get(client.host)
+        if identifier is None:
+            serial = (await client.async_get_device()).get("serial")
+            identifier = self._match_device(serial if isinstance(serial, str) else None)
+            if identifier is None:
+                _LOGGER.debug("No HomeWizard watermeter of the home matches the meter at %s", client.host)
+                return None
+            self._devices[client.host] = identifier
+
+        values = await client.async_get_data()
+        total = values.get("total_liter_m3")
+        flow = values.get("active_liter_lpm")
+
+        for value in (total, flow):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise HomeWizardLocalError(f"Unexpected values from watermeter at {client.host}: {values!r}")
+
+        return identifier, {
+            # Liters, as the other sensors
+            "total": total * 1000 if total is not None else None,
+            "flow": flow,
+        }
+
+    def _match_device(self, serial: str | None) -> str | None:
+        """Return the sanitized identifier of the watermeter with the given serial number."""
+        watermeters = self._device_coordinator.data or []
+
+        if serial:
+            for device in watermeters:
+                if serial.lower() in device["identifier"].lower():
+                    return device["sanitized_identifier"]
+
+        # A home with a single watermeter and a single local host cannot be mistaken
+        if len(watermeters) == 1 and len(self._clients) == 1:
+            return watermeters[0]["sanitized_identifier"]
+
+        return None
+
+    def _failed(self, host: str, error: HomeWizardLocalError, now: datetime) -> None:
+        failures = self._failures[host] = self._failures.get(host, 0) + 1
+
+        if failures >= LOCAL_MAX_FAILURES:
+            if failures == LOCAL_MAX_FAILURES:
+                _LOGGER.warning("HomeWizard watermeter at %s is unreachable, falling back to the cloud: %s", host, error)
+            self._suspended_until[host] = now + timedelta(minutes=LOCAL_RETRY_MINUTES)
+        else:
+            _LOGGER.debug("Error polling HomeWizard watermeter at %s: %s", host, error)
 
-            if not stats_yesterday or "values" not in stats_yesterday:
-                _LOGGER.warning("No yesterday data received for watermeter device.")
-                continue
+class HomeWizardCloudDataUpdateCoordinator(DataUpdateCoordinator):
+    def __init__(
+        self,
+        hass,
+        config_entry,
+        api: HomeWizardCloudApi,
+        home_ids: list[int],
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        backfill_days: int = DEFAULT_BACKFILL_DAYS,
+        local_hosts: list[str] | None = None,
+    ):
+        self.api = api
+        self.home_ids = home_ids
+        # The first home names the persisted stores, as the single home of older entries did
+        self.home_id = home_ids[0]
+        self._pending_stats = None
+        self.backfill_days = backfill_days
+        # Completed days never change, only "today" needs to hit the network
+        self._day_cache = TsdbDayCache(Store(hass, STORAGE_VERSION, f"{DOMAIN}.tsdb_cache.{self.home_id}"))
+        # Caps the number of in-flight TSDB requests during one update cycle
+        self._fetcher = TsdbFetcher(api, self._day_cache, max_concurrency)
+        self._stats_locks: dict[str, asyncio.Lock] = {}
+        # Statistic id => (last sum, start of the last hour) of what was imported
+        self._stat_cursors: dict[str, tuple[float, datetime | None]] = {}
+        self.backfill = HomeWizardCloudBackfill(self)
+        self.reconciler = HomeWizardCloudReconciler(self)
+        self.export = HomeWizardCloudExport(self)
+        self.device_coordinator = HomeWizardCloudDeviceListCoordinator(hass, config_entry, api, home_ids)
+        # Live values of the meters reachable on the LAN, if any are configured
+        self.local_coordinator = (
+            HomeWizardLocalCoordinator(hass, config_entry, local_hosts, self.device_coordinator)
+            if local_hosts else None
+        )
+        # Last known devices and values, used to create entities right away on startup
+        self._snapshot_store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.snapshot.{self.home_id}")
+        # Plans the next poll just after the next expected device upload
+        self._scheduler = SyncCadenceScheduler()
+        # Position of the entry within the spread of the polls, from 0 to 1
+        self._poll_phase = entry_phase(config_entry.entry_id, 1)
+        # Sanitized identifier => recent 15-minute intervals of the watermeter
+        self.windows: dict[str, UsageWindow] = {}
+        # Phase timings of the last update cycle
+        self.last_cycle: CycleTimings | None = None
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=DOMAIN,
+            update_interval=timedelta(minutes=DEFAULT_UPDATE_INTERVAL_MINUTES),
+        )
+        config_entry.async_on_unload(self.device_coordinator.async_add_listener(self._async_devices_updated))
+
+    @callback
+    def _async_devices_updated(self) -> None:
+        """Follow the changes of the device list."""
+        if self.data is None or self.device_coordinator.data is None:
+            return
+
+        devices = {device["sanitized_identifier"]: device for device in self.device_coordinator.data}
+
+        if any(identifier not in self.data for identifier in devices):
+            # New meters, fetch their consumption
+            self.hass.async_create_task(self.async_request_refresh())
+
+        # Forget removed meters right away and update the metadata of the others
+        data = {
+            identifier: {**value, "device": devices[identifier]}
+            for identifier, value in self.data.items()
+            if identifier in devices
+        }
+        if data != self.data:
+            self.async_set_updated_data(data)
+
+    async def async_load(self) -> bool:
+        """Load the persisted state, return whether data was restored from the snapshot."""
+        await self._day_cache.async_load()
+        await self.backfill.async_load()
+        await self.export.async_load()
+
+        stored = await self._snapshot_store.async_load()
+        if not stored:
+            return False
+
+        self._scheduler.load(stored.get("sync_history", {}))
+
+        data = stored.get("data", {})
+        for value in data.values():
+            if value["last_sync_at"] is not None:
+                value["last_sync_at"] = dt_util.parse_datetime(value["last_sync_at"])
+
+        self.data = data
+        _LOGGER.debug("Restored %s HomeWizard watermeters from the last snapshot", len(data))
+        return bool(data)
+
+    async def _async_update_data(self):
+        timings = CycleTimings()
+        requests = self.api.metrics.total("requests")
+
+        try:
+            return await self._async_run_cycle(timings)
+        finally:
+            timings.finish()
+            self.last_cycle = timings
+
+            if timings.duration > SLOW_CYCLE_SECONDS:
+                _LOGGER.debug(
+                    "Slow HomeWizard update cycle: %.1f s, %s requests, phases %s",
+                    timings.duration,
+                    self.api.metrics.total("requests") - requests,
+                    {phase: round(duration, 2) for phase, duration in timings.phases.items()},
+                )
+
+    async def _async_run_cycle(self, timings: CycleTimings):
+        if "recorder" not in self.hass.config.components:
+            _LOGGER.debug("Recorder not loaded, skipping update.")
+            return self.data or {}
 
-            combined_values = stats_yesterday.get("values", []) + stats_today.get("values", [])
+        # The device list has its own slow cadence, only fetch it when it was never loaded
+        if self.device_coordinator.data is None:
+            await self.device_coordinator.async_refresh()
+            if not self.device_coordinator.last_update_success:
+                raise UpdateFailed("Error fetching HomeWizard devices.")
 
-            total = await self.async_inject_cleaned_stats(combined_values, device)
+        watermeters = self.device_coordinator.data
+        self.api.set_polled_meters(self.config_entry.entry_id, len(watermeters))
 
-            last_sync_at = None
+        now = dt_util.now()
+        yesterday = now - timedelta(days=1)
+
+        # Retrieve the data of all devices, both days at once
+        try:
+            with timings.measure("fetch"):
+                stats_today, stats_yesterday = await asyncio.gather(
+                    self._fetcher.async_fetch_day(now, self.hass.config.time_zone, watermeters),
+                    self._fetcher.async_fetch_day(yesterday, self.hass.config.time_zone, watermeters),
+                )
+        except HomeWizardCloudError as ex:
+            raise UpdateFailed(f"Error fetching HomeWizard data: {ex}") from ex
+
+        # Aggregate each watermeter, one failing device must not fail the others
+        results: list[dict | Exception | None] = []
+        aggregated = []
+        for device in watermeters:
+            try:
+                hourly = self._aggregate_device(
+                    device,
+                    stats_today.get(device["identifier"]),
+                    stats_yesterday.get(device["identifier"]),
+                    timings,
+                )
+            except Exception as ex:
+                results.append(ex)
+                continue
 
-            for entry in reversed(combined_values):
-                if entry.get("water") is not None:
-                    last_sync_at = dt_util.parse_datetime(entry["time"])
-                    break
+            results.append(None)
+            if hourly is not None:
+                aggregated.append((len(results) - 1, device, hourly))
 
-            data[device['sanitized_identifier']] = ({
+        # Then import the statistics of all of them in one batch
+        totals = await self.async_inject_cleaned_stats([(device, hourly) for _, device, hourly in aggregated], timings)
+
+        for index, device, hourly in aggregated:
+            total = totals[self.statistic_id(device)]
+            results[index] = total if isinstance(total, Exception) else {
                 "total": total,
                 "unit": UnitOfVolume.LITERS,
                 "device": device,
-                "last_sync_at": last_sync_at,
-            })
+                "last_sync_at": hourly.last_sync_at,
+                "last_interval_usage": hourly.last_interval_usage,
+            }
+
+        data = {}
+        previous = self.data or {}
+
+        for device, result in zip(watermeters, results):
+            if isinstance(result, Exception):
+                _LOGGER.error("Error updating HomeWizard watermeter device '%s': %s", device["identifier"], result)
+                result = None
+
+            if result is None and device['sanitized_identifier'] in previous:
+                # Keep the last known values of a device that is still listed
+                result = {**previous[device['sanitized_identifier']], "device": device}
+
+            if result is not None:
+                data[device['sanitized_identifier']] = result
+
+        if watermeters and all(isinstance(result, Exception) for result in results):
+            # The device list may be outdated, fetch it again on the next update
+            self.device_coordinator.async_invalidate()
+            raise UpdateFailed("Error updating all HomeWizard watermeter devices.")
+
+        self._scheduler.retain({device['sanitized_identifier'] for device in watermeters})
+        for identifier in set(self.windows) - {device['sanitized_identifier'] for device in watermeters}:
+            del self.windows[identifier]
+        for identifier, value in data.items():
+            self._scheduler.record(identifier, value["last_sync_at"], now)
+        # Spread the polls of the different entries instead of firing them all at once,
+        # only slightly when the poll is planned right after a predicted upload
+        delay, predicted = self._scheduler.next_interval(now)
+        spread = (PREDICTED_POLL_SPREAD_MINUTES if predicted else POLL_SPREAD_MINUTES) * 60
+        self.update_interval = min(
+            align_to_phase(now, delay, self._poll_phase * spread, spread),
+            timedelta(minutes=MAX_UPDATE_INTERVAL_MINUTES),
+        )
+
+        self._snapshot_store.async_delay_save(lambda: self._snapshot_to_save(data), SNAPSHOT_SAVE_DELAY)
+
+        # Catch up with values that reached the cloud after their hour was imported
+        self.reconciler.async_maybe_start({now.date(): stats_today, yesterday.date(): stats_yesterday}, watermeters)
 
         return data
 
-    async def async_inject_cleaned_stats(self, values: list, device: dict):
-        """Clean data and inject into HA statistics with daily block handling."""
-        statistic_id = f"{DOMAIN}:{device['sanitized_identifier']}_total"
+    def _snapshot_to_save(self, data: dict) -> dict:
+        return {
+            "sync_history": self._scheduler.as_dict(),
+            "data": {
+                identifier: {
+                    **value,
+                    "last_sync_at": value["last_sync_at"].isoformat() if value["last_sync_at"] else None,
+                }
+                for identifier, value in data.items()
+            }
+        }
+
+    def _aggregate_device(
+        self,
+        device: dict,
+        stats_today: dict | None,
+        stats_yesterday: dict | None,
+        timings: CycleTimings,
+    ) -> HourlyUsage | None:
+        """Aggregate both days of data of a watermeter into hourly usage."""
+        if not stats_today or "values" not in stats_today:
+            _LOGGER.warning("No data received for watermeter device.")
+            return None
+
+        if not stats_yesterday or "values" not in stats_yesterday:
+            _LOGGER.warning("No yesterday data received for watermeter device.")
+            return None
+
+        window = self.windows.get(device["sanitized_identifier"])
+        if window is None:
+            window = self.windows[device["sanitized_identifier"]] = UsageWindow(USAGE_WINDOW_HOURS)
+
+        # Hourly sums, last sync time and recent intervals come out of a single pass over both days
+        with timings.measure("aggregation"):
+            return aggregate_hourly(
+                chain(stats_yesterday.get("values", []), stats_today.get("values", [])),
+                dt_util.now(),
+                window,
+            )
 
-        # Get the absolute last point in history to ensure continuity
-        last_stats = await get_instance(self.hass).async_add_executor_job(
-            get_last_statistics, self.hass, 1, statistic_id, True, {"sum"}
-        )
+    async def async_fetch_device_day(self, date: datetime, device: dict, use_cache: bool = True) -> dict | None:
+        """Fetch the TSDB data of a single device for a day."""
+        return (
+            await self._fetcher.async_fetch_day(date, self.hass.config.time_zone, [device], use_cache)
+        ).get(device["identifier"])
 
-        last_sum = 0.0
-        last_stat_time = None
+    async def async_fetch_history_day(self, day: date, devices: list) -> dict:
+        """Fetch a past day of several devices, waiting out rate limits between attempts.
 
-        if statistic_id in last_stats and last_stats[statistic_id]:
-            point = last_stats[statistic_id][0]
-            last_sum = point.get("sum") or 0.0
+        The requests are counted on the background share of the request budget. Once it
+        is spent, the fetch pauses until requests age out of it, without using up an
+        attempt. Devices still missing from the result after the last attempt could
+        not be fetched.
+        """
+        data = {}
+        attempt = 0
 
-            raw_start = point.get("start")
-            if raw_start is not None:
-                if isinstance(raw_start, (int, float)):
-                    last_stat_time = dt_util.utc_from_timestamp(raw_start)
-                else:
-                    last_stat_time = dt_util.as_utc(raw_start)
+        while attempt < HISTORY_MAX_ATTEMPTS:
+            missing = [device for device in devices if device["identifier"] not in data]
+            if not missing:
+                break
 
-        metadata = StatisticMetaData(
-            has_sum=True,
-            name=f"{device.get('name')} Total",
-            source=DOMAIN,
-            statistic_id=statistic_id,
-            unit_of_measurement=UnitOfVolume.LITERS,
-            unit_class=SensorDeviceClass.VOLUME,
-            mean_type=StatisticMeanType.NONE,
-        )
+            if budget_wait := self.api.background_budget_wait:
+                _LOGGER.debug("HomeWizard request budget of background jobs spent, pausing for %.0f s", budget_wait)
+                await asyncio.sleep(budget_wait)
 
-        hourly_data = {}
-        for entry in values:
-            # Ignore nulls (mainly future hours)
-            if entry.get("water") is None:
-                continue
+            if attempt:
+                await asyncio.sleep(self.api.rate_limited_for or HISTORY_RETRY_DELAY_SECONDS)
+            elif self.api.rate_limited_for:
+                await asyncio.sleep(self.api.rate_limited_for)
 
-            time = dt_util.parse_datetime(entry["time"])
-            if not time:
+            try:
+                result = await self._fetcher.async_fetch_day(
+                    dt_util.start_of_local_day(day), self.hass.config.time_zone, missing, background=True
+                )
+            except HomeWizardCloudBudgetExceededError:
                 continue
 
-            hour_timestamp = time.replace(minute=0, second=0, microsecond=0)
-
-            # Security: don't process data far in the future
-            if hour_timestamp > dt_util.now() + timedelta(hours=1):
+            data.update(
+                (identifier, value) for identifier, value in result.items() if value and "values" in value
+            )
+            if len(data) < len(devices) and self.api.background_budget_wait:
+                # The budget ran out during the day, not the API
                 continue
+            attempt += 1
 
-            if hour_timestamp not in hourly_data:
-                hourly_data[hour_timestamp] = 0.0
-            hourly_data[hour_timestamp] += float(entry["water"])
+        return data
 
-        # Build statistics starting from the last known sum
+    def upload_cadence(self, identifier: str) -> timedelta:
+        """Return the usual delay between two uploads of a watermeter, by sanitized identifier."""
+        return self._scheduler.cadence(identifier) or timedelta(minutes=DEFAULT_UPDATE_INTERVAL_MINUTES)
+
+    def cached_day(self, day: date, device: dict) -> dict | None:
+        """Return the cached TSDB data of a completed day of a device, if any."""
+        return self._day_cache.get(day, device["identifier"])
+
+    async def async_inject_cleaned_stats(
+        self,
+        items: list[tuple[dict, HourlyUsage]],
+        timings: CycleTimings | None = None,
+    ) -> dict[str, float | Exception]:
+        """Inject the hourly usage of watermeters into HA statistics, after their last imported hour.
+
+        The missing cursors are read from the recorder in a single executor job, then the
+        imports of all devices are queued together. Return the total of each statistic,
+        or the error that prevented its import.
+        """
+        timings = timings or CycleTimings()
+        statistic_ids = sorted({self.statistic_id(device) for device, _ in items})
+        totals = {}
+
+        async with contextlib.AsyncExitStack() as stack:
+            # Always taken in the same order, so that two batches cannot deadlock
+            for statistic_id in statistic_ids:
+                await stack.enter_async_context(self.stats_lock(statistic_id))
+
+            # Get the absolute last point in history to ensure continuity
+            try:
+                with timings.measure("recorder_lookup"):
+                    cursors = await self.async_get_cursors(statistic_ids)
+            except Exception as ex:
+                return {statistic_id: ex for statistic_id in statistic_ids}
+
+            with timings.measure("import"):
+                for device, hourly in items:
+                    statistic_id = self.statistic_id(device)
+                    try:
+                        totals[statistic_id] = self._import_hourly(device, hourly, cursors[statistic_id])
+                    except Exception as ex:
+                        totals[statistic_id] = ex
+
+        return totals
+
+    @callback
+    def _import_hourly(self, device: dict, hourly: HourlyUsage, cursor: tuple[float, datetime | None]) -> float:
+        """Queue the import of the hours after the cursor of a watermeter, return its new total."""
+        statistic_id = self.statistic_id(device)
+        last_sum, last_stat_time = cursor
+        last_stat_timestamp = last_stat_time.timestamp() if last_stat_time else None
+
+        # Build statistics starting from the last known sum. External statistics only
+        # accept hourly starts, the 15-minute resolution stays on the flow rate sensor
         stat_data = []
         cumulative_sum = last_sum
 
-        for hour in sorted(hourly_data.keys()):
-            hour_utc = dt_util.as_utc(hour)
-
-            if last_stat_time and hour_utc <= last_stat_time:
+        for hour, usage in zip(hourly.hours, hourly.usage):
+            if last_stat_timestamp is not None and hour <= last_stat_timestamp:
                 continue
 
-            usage = hourly_data[hour]
-
             # Ignore hours without water usage
             if usage == 0:
                 continue
@@ -165,13 +628,99 @@ class HomeWizardCloudDataUpdateCoordinator(DataUpdateCoordinator):
 
             stat_data.append(
                 StatisticData(
-                    start=hour,
+                    start=dt_util.utc_from_timestamp(hour),
                     state=usage,
                     sum=cumulative_sum
                 )
             )
 
         if stat_data:
-            async_add_external_statistics(self.hass, metadata, stat_data)
+            async_add_external_statistics(self.hass, self.statistic_metadata(device), stat_data)
+            self.set_cursor(statistic_id, cumulative_sum, dt_util.as_utc(stat_data[-1]["start"]))
+
+        return cumulative_sum
+
+    async def async_get_cursor(self, statistic_id: str) -> tuple[float, datetime | None]:
+        """Return the last imported sum and hour of a statistic."""
+        return (await self.async_get_cursors([statistic_id]))[statistic_id]
+
+    async def async_get_cursors(self, statistic_ids: list[str]) -> dict[str, tuple[float, datetime | None]]:
+        """Return the last imported sum and hour of statistics.
+
+        A cursor is read from the recorder only once, it is then kept up to date in
+        memory after each import. It is read again if it looks inconsistent.
+        """
+        for statistic_id in statistic_ids:
+            cursor = self._stat_cursors.get(statistic_id)
+            if cursor is not None and cursor[1] is not None and cursor[1] > dt_util.utcnow() + timedelta(hours=1):
+                _LOGGER.warning("Statistics cursor of '%s' is in the future, reading it again from the recorder.", statistic_id)
+                self.invalidate_cursor(statistic_id)
+
+        missing = [statistic_id for statistic_id in statistic_ids if statistic_id not in self._stat_cursors]
+        if missing:
+            self._stat_cursors.update(await self.async_get_last_statistics(missing))
+
+        return {statistic_id: self._stat_cursors[statistic_id] for statistic_id in statistic_ids}
+
+    def set_cursor(self, statistic_id: str, last_sum: float, last_stat_time: datetime | None) -> None:
+        """Move the cursor of a statistic after an import."""
+        self._stat_cursors[statistic_id] = (last_sum, last_stat_time)
+
+    def invalidate_cursor(self, statistic_id: str) -> None:
+        """Forget the cursor of a statistic so that it is read again from the recorder."""
+        self._stat_cursors.pop(statistic_id, None)
+
+    @staticmethod
+    def statistic_id(device: dict) -> str:
+        """Return the external statistic id of a watermeter."""
+        return f"{DOMAIN}:{device['sanitized_identifier']}_total"
+
+    @classmethod
+    def statistic_metadata(cls, device: dict) -> StatisticMetaData:
+        """Return the external statistic metadata of a watermeter."""
+        return StatisticMetaData(
+            has_sum=True,
+            name=f"{device.get('name')} Total",
+            source=DOMAIN,
+            statistic_id=cls.statistic_id(device),
+            unit_of_measurement=UnitOfVolume.LITERS,
+            unit_class=SensorDeviceClass.VOLUME,
+            mean_type=StatisticMeanType.NONE,
+        )
+
+    def stats_lock(self, statistic_id: str) -> asyncio.Lock:
+        """Return the lock serializing the imports of a statistic."""
+        return self._stats_locks.setdefault(statistic_id, asyncio.Lock())
+
+    async def async_get_last_statistic(self, statistic_id: str) -> tuple[float, datetime | None]:
+        """Return the sum and the start time of the last recorded statistic."""
+        return (await self.async_get_last_statistics([statistic_id]))[statistic_id]
+
+    async def async_get_last_statistics(self, statistic_ids: list[str]) -> dict[str, tuple[float, datetime | None]]:
+        """Return the sum and the start time of the last recorded statistic of each id, in one executor job."""
+        return await get_instance(self.hass).async_add_executor_job(self._get_last_statistics, statistic_ids)
+
+    def _get_last_statistics(self, statistic_ids: list[str]) -> dict[str, tuple[float, datetime | None]]:
+        """Read the last recorded statistics, in the executor."""
+        cursors = {}
+
+        for statistic_id in statistic_ids:
+            last_stats = get_last_statistics(self.hass, 1, statistic_id, True, {"sum"})
+
+            last_sum = 0.0
+            last_stat_time = None
+
+            if statistic_id in last_stats and last_stats[statistic_id]:
+                point = last_stats[statistic_id][0]
+                last_sum = point.get("sum") or 0.0
+
+                raw_start = point.get("start")
+                if raw_start is not None:
+                    if isinstance(raw_start, (int, float)):
+                        last_stat_time = dt_util.utc_from_timestamp(raw_start)
+                    else:
+                        last_stat_time = dt_util.as_utc(raw_start)
+
+            cursors[statistic_id] = (last_sum, last_stat_time)
 
-        return cumulative_sum
\ No newline at end of file
+        return cursors
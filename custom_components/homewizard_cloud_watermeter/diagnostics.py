@@ -0,0 +1,32 @@
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, CONF_EMAIL, CONF_PASSWORD
+
+TO_REDACT = {CONF_EMAIL, CONF_PASSWORD}
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return the diagnostics of a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data["coordinator"]
+    api = data["api"]
+
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": str(coordinator.update_interval),
+            "devices": len(coordinator.data or {}),
+            "last_cycle": coordinator.last_cycle.as_dict() if coordinator.last_cycle else None,
+            "backfill_running": coordinator.backfill.running,
+        },
+        "api": {
+            "rate_limited_for": api.rate_limited_for,
+            # Shared by all the entries of the account
+            **api.metrics.as_dict(),
+        },
+    }
@@ -0,0 +1,84 @@
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+
+class HomeWizardEntity(CoordinatorEntity):
+    """Coordinator entity only writing its state when it changed."""
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        # Availability, state and attributes last written to the state machine
+        self._written_state = None
+
+    def _refresh(self) -> None:
+        """Update what the entity caches from the coordinator data."""
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        self._refresh()
+
+        state = (self.available, self.state, self.extra_state_attributes)
+        if state == self._written_state:
+            return
+
+        self._written_state = state
+        self.async_write_ha_state()
+
+class HomeWizardDeviceEntity(HomeWizardEntity):
+    """Common base for all HomeWizard watermeter entities."""
+    _attr_has_entity_name = True
+
+    def __init__(self, coordinator, value):
+        """Initialize the entity."""
+        super().__init__(coordinator)
+        self._sanitized_identifier = value["device"].get("sanitized_identifier")
+        # View of the device in the coordinator data, the last known one once it is gone
+        self._value = value
+        self._attr_device_info = self._device_info(value["device"])
+
+        # Unique ID needs to be unique per entity, so we append the class name or a suffix
+        # This will be overridden or extended in child classes
+        self._attr_unique_id = f"{self._sanitized_identifier}_{self.__class__.__name__}"
+
+    # Whether the entity also uses the live values polled on the LAN
+    _follows_local = False
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+
+        local_coordinator = self.coordinator.local_coordinator
+        if self._follows_local and local_coordinator is not None:
+            self.async_on_remove(local_coordinator.async_add_listener(self._handle_coordinator_update))
+
+    def _refresh(self) -> None:
+        self._value = (self.coordinator.data or {}).get(self._sanitized_identifier, self._value)
+
+    @property
+    def available(self) -> bool:
+        """Return False once the device is no longer part of the home."""
+        return super().available and self._sanitized_identifier in (self.coordinator.data or {})
+
+    @property
+    def local_values(self) -> dict | None:
+        """Return the live values of the device polled on the LAN, if it is reachable."""
+        local_coordinator = self.coordinator.local_coordinator
+        if local_coordinator is None:
+            return None
+        return (local_coordinator.data or {}).get(self._sanitized_identifier)
+
+    def _device_info(self, device: dict):
+        """Return device information to group all entities under the same device."""
+        # Ensure we have a valid device
+        if not device:
+            return None
+
+        return {
+            "identifiers": {(DOMAIN, self._sanitized_identifier)},
+            "name": device.get("name", "Watermeter"),
+            "manufacturer": "HomeWizard",
+            "model": "Watermeter",
+            "model_id": device.get("model"),
+            "hw_version": device.get("hardwareVersion"),
+            "sw_version": device.get("version"),
+        }
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+from datetime import date, datetime, timedelta
+import importlib.util
+import logging
+import os
+from typing import TYPE_CHECKING
+
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    STORAGE_VERSION,
+    EXPORT_CHUNK_DAYS,
+    EXPORT_FORMAT_CSV,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import HomeWizardCloudDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+CSV_HEADER = ("time", "water")
+
+def parquet_available() -> bool:
+    """Whether pyarrow is installed, which the Parquet format needs."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+def day_rows(result: dict) -> list[tuple[datetime, float]]:
+    """Return the (start, usage in L) intervals of a TSDB day holding data."""
+    rows = []
+
+    for entry in result.get("values", []):
+        water = entry.get("water")
+        # Ignore nulls (mainly future slots)
+        if water is None:
+            continue
+
+        try:
+            time = datetime.fromisoformat(entry["time"])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        rows.append((time, float(water)))
+
+    return rows
+
+def write_csv(path: str, size: int, days: list[tuple[date, list]]) -> int:
+    """Append days to a CSV file cut back to `size` bytes first, return the new size."""
+    size = min(size, os.path.getsize(path)) if os.path.exists(path) else 0
+
+    with open(path, "a+", newline="", encoding="utf-8") as file:
+        # Drop what an interrupted export wrote after its last saved progress
+        file.truncate(size)
+        writer = csv.writer(file)
+        if size == 0:
+            writer.writerow(CSV_HEADER)
+        for _day, rows in days:
+            writer.writerows((time.isoformat(), water) for time, water in rows)
+
+    return os.path.getsize(path)
+
+def write_parquet(directory: str, days: list[tuple[date, list]]) -> None:
+    """Write each day to its own Parquet file of the directory, replacing it if present."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+
+    for day, rows in days:
+        table = pa.table({
+            "time": pa.array([time for time, _water in rows], type=pa.timestamp("s", tz="UTC")),
+            "water": pa.array([water for _time, water in rows], type=pa.float64()),
+        })
+        pq.write_table(table, os.path.join(directory, f"{day.isoformat()}.parquet"))
+
+class HomeWizardCloudExport:
+    """Export the 15-minute consumption history of watermeters to files.
+
+    Days are fetched oldest first, by chunks, each day in a single request for all
+    exported meters, and a chunk is written before the next one is fetched so that
+    memory does not grow with the length of the range. A CSV file per meter is
+    appended to, Parquet gets a file per meter and day. The next day and the size of
+    the CSV files are persisted after each chunk, an interrupted export resumes there.
+    """
+
+    def __init__(self, coordinator: HomeWizardCloudDataUpdateCoordinator):
+        self._coordinator = coordinator
+        self._hass = coordinator.hass
+        self._store = Store(self._hass, STORAGE_VERSION, f"{DOMAIN}.export.{coordinator.home_id}")
+        # Unfinished export: range, format, meters, next day and CSV file sizes
+        self._progress: dict | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def directory(self) -> str:
+        return self._hass.config.path(DOMAIN, "export")
+
+    async def async_load(self) -> None:
+        stored = await self._store.async_load()
+        if stored:
+            self._progress = stored.get("progress")
+
+    def async_start(self, devices: list, start_day: date, end_day: date, file_format: str) -> None:
+        """Start an export in the background, resuming the same one if it was interrupted."""
+        if self.running:
+            _LOGGER.info("A HomeWizard export is already running, ignoring request.")
+            return
+
+        job = {
+            "start": start_day.isoformat(),
+            "end": end_day.isoformat(),
+            "format": file_format,
+            "devices": sorted(device["sanitized_identifier"] for device in devices),
+        }
+        if self._progress is None or any(self._progress.get(key) != value for key, value in job.items()):
+            self._progress = {**job, "next_day": job["start"], "sizes": {}}
+
+        self._launch()
+
+    def async_resume(self) -> None:
+        """Resume an interrupted export, if any."""
+        if self._progress is not None and not self.running:
+            self._launch()
+
+    def _launch(self) -> None:
+        self._task = self._coordinator.config_entry.async_create_background_task(
+            self._hass,
+            self.async_run(),
+            f"{DOMAIN} export {self._coordinator.home_id}",
+        )
+
+    async def async_run(self) -> None:
+        """Export the remaining days of the current export."""
+        progress = self._progress
+        devices = [
+            value["device"]
+            for identifier, value in (self._coordinator.data or {}).items()
+            if identifier in progress["devices"]
+        ]
+
+        if not devices:
+            _LOGGER.warning("None of the HomeWizard watermeters to export exist anymore, export cancelled")
+            self._progress = None
+            await self._async_save()
+            return
+
+        day = date.fromisoformat(progress["next_day"])
+        end_day = date.fromisoformat(progress["end"])
+        _LOGGER.info("Exporting HomeWizard watermeters from %s to %s into %s", day, end_day, self.directory)
+
+        try:
+            await self._hass.async_add_executor_job(os.makedirs, self.directory, 0o755, True)
+
+            while day <= end_day:
+                chunk = [day + timedelta(days=offset) for offset in range(min(EXPORT_CHUNK_DAYS, (end_day - day).days + 1))]
+
+                # The coordinator semaphore bounds the number of days fetched in parallel
+                results = await asyncio.gather(
+                    *(self._coordinator.async_fetch_history_day(chunk_day, devices) for chunk_day in chunk)
+                )
+
+                for chunk_day, result in zip(chunk, results):
+                    missing = [device["identifier"] for device in devices if device["identifier"] not in result]
+                    if missing:
+                        _LOGGER.warning(
+                            "Could not fetch %s for HomeWizard watermeters %s, export will resume later",
+                            chunk_day,
+                            ", ".join(missing),
+                        )
+                        return
+
+                sizes = {}
+                for device in devices:
+                    days = [(chunk_day, day_rows(result[device["identifier"]])) for chunk_day, result in zip(chunk, results)]
+                    size = await self._async_write(device, days)
+                    if size is not None:
+                        sizes[device["sanitized_identifier"]] = size
+
+                # The sizes only move with the day they were written up to: after a failure
+                # within the chunk, the files are cut back to the saved ones on the next run
+                day = chunk[-1] + timedelta(days=1)
+                progress["sizes"].update(sizes)
+                progress["next_day"] = day.isoformat()
+                await self._async_save()
+        except Exception as ex:
+            _LOGGER.error("Error while exporting HomeWizard watermeters: %s", ex)
+            return
+
+        _LOGGER.info("Export of HomeWizard watermeters completed")
+        self._progress = None
+        await self._async_save()
+
+    def _path(self, identifier: str) -> str:
+        """Return the CSV file, or the Parquet directory, of a meter for the current export."""
+        progress = self._progress
+        return os.path.join(self.directory, f"{identifier}_{progress['start']}_{progress['end']}")
+
+    async def _async_write(self, device: dict, days: list[tuple[date, list]]) -> int | None:
+        """Write the days of a meter, return the new size of its CSV file."""
+        identifier = device["sanitized_identifier"]
+        path = self._path(identifier)
+
+        if self._progress["format"] == EXPORT_FORMAT_CSV:
+            return await self._hass.async_add_executor_job(
+                write_csv, f"{path}.csv", self._progress["sizes"].get(identifier, 0), days
+            )
+
+        await self._hass.async_add_executor_job(write_parquet, path, days)
+        return None
+
+    async def _async_save(self) -> None:
+        await self._store.async_save({"progress": self._progress})
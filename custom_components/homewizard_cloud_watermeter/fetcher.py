@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+import logging
+
+from .api import HomeWizardCloudApi, HomeWizardCloudBudgetExceededError
+from .cache import TsdbDayCache
+
+_LOGGER = logging.getLogger(__name__)
+
+class TsdbFetcher:
+    """Fetch the TSDB data of several watermeters, day by day.
+
+    Completed days are served from the day cache, the others are asked for all
+    devices in a single batched request, falling back to one request per device
+    for what the batch did not return. A semaphore caps the in-flight requests.
+    """
+
+    def __init__(self, api: HomeWizardCloudApi, day_cache: TsdbDayCache, max_concurrency: int):
+        self.api = api
+        self._day_cache = day_cache
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def async_fetch_day(
+        self, date: datetime, timezone: str, devices: list, use_cache: bool = True, background: bool = False
+    ) -> dict:
+        """Fetch the TSDB data of a day for all devices, keyed by device identifier.
+
+        Without `use_cache`, cached days are downloaded again and replace the cached copy.
+        Requests of `background` jobs are counted on their own share of the budget.
+        """
+        day = date.date()
+        data = {}
+
+        if use_cache:
+            for device in devices:
+                cached = self._day_cache.get(day, device["identifier"])
+                if cached is not None:
+                    data[device["identifier"]] = cached
+
+        identifiers = [device["identifier"] for device in devices if device["identifier"] not in data]
+        if not identifiers:
+            return data
+
+        # Ask for all devices in a single request first
+        data.update(await self._async_limited(
+            self.api.async_get_tsdb_data_batch(date, timezone, identifiers, background)
+        ))
+
+        # Fall back to one request per device for what the batch did not return
+        missing = [identifier for identifier in identifiers if identifier not in data]
+        results = await asyncio.gather(
+            *(
+                self._async_limited(self.api.async_get_tsdb_data(date, timezone, identifier, background))
+                for identifier in missing
+            ),
+            return_exceptions=True,
+        )
+
+        for identifier, result in zip(missing, results):
+            if background and isinstance(result, HomeWizardCloudBudgetExceededError):
+                # Background jobs pause and fetch the device again
+                _LOGGER.debug("HomeWizard data for device '%s' postponed: %s", identifier, result)
+                continue
+            if isinstance(result, Exception):
+                _LOGGER.error("Error fetching HomeWizard data for device '%s': %s", identifier, result)
+                continue
+            data[identifier] = result
+
+        # Keep completed days so that they are not downloaded again
+        now = datetime.now(date.tzinfo)
+        for identifier in identifiers:
+            result = data.get(identifier)
+            if result and "values" in result and TsdbDayCache.is_complete(day, result, now):
+                self._day_cache.set(day, identifier, result)
+
+        return data
+
+    async def _async_limited(self, coro):
+        """Run an API call while holding a slot of the concurrency cap."""
+        async with self._semaphore:
+            return await coro
@@ -0,0 +1,50 @@
+import asyncio
+import aiohttp
+import async_timeout
+
+from .api import HomeWizardCloudError
+
+# The meter answers on the LAN right away, or not at all
+LOCAL_REQUEST_TIMEOUT = 3
+
+class HomeWizardLocalError(HomeWizardCloudError):
+    """The local API of a meter could not be reached or answered badly."""
+
+class HomeWizardLocalApi:
+    """Client of the local API (v1) of a watermeter.
+
+    Only available on meters powered over USB, battery-powered ones turn their Wi-Fi
+    off between uploads to the cloud.
+    """
+
+    def __init__(self, host: str, session: aiohttp.ClientSession):
+        # May include a port, e.g. to run against a local stand-in of the meter
+        self.host = host
+        self._session = session
+
+    async def async_get_device(self) -> dict:
+        """Return the product information of the meter, including its serial number."""
+        return await self._async_get("/api")
+
+    async def async_get_data(self) -> dict:
+        """Return the live measurements, `total_liter_m3` and `active_liter_lpm` among others."""
+        return await self._async_get("/api/v1/data")
+
+    async def _async_get(self, path: str) -> dict:
+        url = f"http://{self.host}{path}"
+
+        try:
+            async with async_timeout.timeout(LOCAL_REQUEST_TIMEOUT):
+                async with self._session.get(url) as response:
+                    if response.status != 200:
+                        raise HomeWizardLocalError(f"Unexpected HTTP status {response.status} from {self.host}")
+                    data = await response.json()
+        except (asyncio.TimeoutError, aiohttp.ClientError) as ex:
+            raise HomeWizardLocalError(f"Cannot reach watermeter at {self.host}: {ex!r}") from ex
+        except ValueError as ex:
+            # Not JSON at all, e.g. another device answering on that address
+            raise HomeWizardLocalError(f"Invalid answer from watermeter at {self.host}: {ex!r}") from ex
+
+        if not isinstance(data, dict):
+            raise HomeWizardLocalError(f"Unexpected answer from watermeter at {self.host}")
+        return data
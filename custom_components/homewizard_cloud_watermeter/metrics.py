@@ -0,0 +1,94 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import time
+
+# Upper bounds of the request latency histogram, in seconds (the last bucket is unbounded)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Phases of an update cycle, in execution order
+CYCLE_PHASES = ("fetch", "aggregation", "recorder_lookup", "import")
+
+class EndpointMetrics:
+    """Counters of the requests sent to one endpoint of the cloud."""
+
+    __slots__ = ("requests", "errors", "retries", "bytes", "latency_sum", "latency_buckets")
+
+    def __init__(self):
+        # Every attempt counts as a request, failed ones also count as an error
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, latency: float) -> None:
+        """Record the latency of an answered request."""
+        self.latency_sum += latency
+        self.latency_buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def as_dict(self) -> dict:
+        answered = sum(self.latency_buckets)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "latency_mean": self.latency_sum / answered if answered else None,
+            "latency_histogram": {
+                f"le_{bound}" if bound is not None else "inf": count
+                for bound, count in zip((*LATENCY_BUCKETS, None), self.latency_buckets)
+            },
+        }
+
+class ApiMetrics:
+    """Metrics of an API client, per endpoint."""
+
+    def __init__(self):
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self.token_refreshes = 0
+
+    def endpoint(self, name: str) -> EndpointMetrics:
+        return self.endpoints.setdefault(name, EndpointMetrics())
+
+    def total(self, counter: str) -> int:
+        """Sum a counter over all endpoints."""
+        return sum(getattr(metrics, counter) for metrics in self.endpoints.values())
+
+    def as_dict(self) -> dict:
+        return {
+            "token_refreshes": self.token_refreshes,
+            "endpoints": {name: metrics.as_dict() for name, metrics in self.endpoints.items()},
+        }
+
+class CycleTimings:
+    """Wall time spent in each phase of an update cycle.
+
+    The time of a phase is summed over all its occurrences in the cycle, e.g. the
+    aggregation of every device.
+    """
+
+    __slots__ = ("phases", "started_at", "duration")
+
+    def __init__(self):
+        self.phases = dict.fromkeys(CYCLE_PHASES, 0.0)
+        self.started_at = time.perf_counter()
+        self.duration: float | None = None
+
+    @contextmanager
+    def measure(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[phase] += time.perf_counter() - start
+
+    def finish(self) -> float:
+        self.duration = time.perf_counter() - self.started_at
+        return self.duration
+
+    def as_dict(self) -> dict:
+        return {
+            "duration": self.duration,
+            "phases": dict(self.phases),
+        }
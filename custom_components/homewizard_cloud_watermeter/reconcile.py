@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData
+from homeassistant.components.recorder.statistics import async_add_external_statistics, statistics_during_period
+from homeassistant.util import dt as dt_util
+
+from .aggregation import aggregate_hourly
+from .const import DOMAIN, RECONCILE_DAYS, RECONCILE_INTERVAL_HOURS
+
+if TYPE_CHECKING:
+    from .coordinator import HomeWizardCloudDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# Usage differences below this are rounding, not late data (L)
+TOLERANCE = 1e-6
+
+class HomeWizardCloudReconciler:
+    """Repair the recorded hourly statistics that disagree with the cloud series.
+
+    Values may reach the cloud after their hour was imported, and are then never
+    imported by the regular update which only moves forward. Every few hours, the
+    recorded statistics of the last days are compared with the series already at hand
+    (the days of the update cycle and the day cache). The affected days of a device are
+    fetched again, bypassing the cache, and its statistics are rewritten from the first
+    changed hour with corrected sums, in a single import.
+    """
+
+    def __init__(self, coordinator: HomeWizardCloudDataUpdateCoordinator):
+        self._coordinator = coordinator
+        self._hass = coordinator.hass
+        self._last_run: datetime | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def async_maybe_start(self, fresh: dict[date, dict], devices: list) -> None:
+        """Start a reconciliation in the background if the last one is old enough.
+
+        `fresh` holds the TSDB data just fetched by the update cycle, by day then by
+        device identifier.
+        """
+        now = dt_util.utcnow()
+
+        # A backfill rewrites the same range, the next run will check its result
+        if self.running or self._coordinator.backfill.running:
+            return
+
+        if self._last_run is not None and now - self._last_run < timedelta(hours=RECONCILE_INTERVAL_HOURS):
+            return
+
+        self._last_run = now
+        self._task = self._coordinator.config_entry.async_create_background_task(
+            self._hass,
+            self.async_run(fresh, devices),
+            f"{DOMAIN} reconcile {self._coordinator.home_id}",
+        )
+
+    async def async_run(self, fresh: dict[date, dict], devices: list) -> None:
+        """Reconcile the statistics of the given watermeters."""
+        today = dt_util.now().date()
+        days = [today - timedelta(days=offset) for offset in range(RECONCILE_DAYS, -1, -1)]
+
+        # Let pending imports land, then read the recorded hours of all devices at once
+        await get_instance(self._hass).async_block_till_done()
+        recorded = await get_instance(self._hass).async_add_executor_job(
+            statistics_during_period,
+            self._hass,
+            dt_util.start_of_local_day(days[0]),
+            None,
+            {self._coordinator.statistic_id(device) for device in devices},
+            "hour",
+            None,
+            {"state", "sum"},
+        )
+
+        for device in devices:
+            statistic_id = self._coordinator.statistic_id(device)
+            try:
+                await self._async_reconcile_device(device, days, fresh, recorded.get(statistic_id, []))
+            except Exception as ex:
+                _LOGGER.error("Error while reconciling HomeWizard watermeter '%s': %s", device["identifier"], ex)
+
+    async def _async_reconcile_device(self, device: dict, days: list[date], fresh: dict[date, dict], recorded: list) -> None:
+        """Compare the recorded hours of a watermeter with its series, and rewrite them if needed."""
+        statistic_id = self._coordinator.statistic_id(device)
+        rows = {_timestamp(row["start"]): row for row in recorded}
+        if not rows:
+            return
+
+        # Only hours already imported are compared, newer ones belong to the regular update
+        until = max(rows)
+
+        cached_days = set()
+        series = {}
+        for day in days:
+            cached = self._coordinator.cached_day(day, device)
+            if cached is not None:
+                cached_days.add(day)
+                series[day] = cached
+            elif (fresh.get(day) or {}).get(device["identifier"]) is not None:
+                series[day] = fresh[day][device["identifier"]]
+
+        hourly = self._hourly_by_day(series)
+        changed = _changed_hours(rows, hourly, until)
+        if not changed:
+            return
+
+        # Cached days may have been completed before late values arrived, fetch them again
+        affected = {dt_util.as_local(dt_util.utc_from_timestamp(hour)).date() for hour in changed} & cached_days
+        if affected:
+            refetched = await asyncio.gather(
+                *(
+                    self._coordinator.async_fetch_device_day(dt_util.start_of_local_day(day), device, use_cache=False)
+                    for day in sorted(affected)
+                )
+            )
+            for day, result in zip(sorted(affected), refetched):
+                if result and "values" in result:
+                    series[day] = result
+
+            hourly = self._hourly_by_day(series)
+            changed = _changed_hours(rows, hourly, until)
+            if not changed:
+                return
+
+        async with self._coordinator.stats_lock(statistic_id):
+            _, last_stat_time = await self._coordinator.async_get_cursor(statistic_id)
+            if last_stat_time is None or last_stat_time.timestamp() != until:
+                # Hours were imported since the recorder was read, the next run will check them
+                return
+
+            first = changed[0]
+            before = [hour for hour in rows if hour < first]
+            if before:
+                cumulative_sum = rows[max(before)]["sum"] or 0.0
+            else:
+                first_row = rows[min(rows)]
+                cumulative_sum = (first_row["sum"] or 0.0) - (first_row["state"] or 0.0)
+
+            stat_data = []
+            for hour in sorted({hour for hour in rows if hour >= first} | {hour for hour in hourly if first <= hour <= until}):
+                usage = hourly[hour] if hour in hourly else rows[hour]["state"] or 0.0
+
+                # Hours without water usage are not recorded, unless they were wrongly
+                if usage == 0 and hour not in rows:
+                    continue
+
+                cumulative_sum += usage
+                stat_data.append(StatisticData(start=dt_util.utc_from_timestamp(hour), state=usage, sum=cumulative_sum))
+
+            _LOGGER.info(
+                "Rewriting %s hours of HomeWizard watermeter '%s' from %s, %s of them changed",
+                len(stat_data),
+                device["identifier"],
+                dt_util.utc_from_timestamp(first),
+                len(changed),
+            )
+            async_add_external_statistics(self._hass, self._coordinator.statistic_metadata(device), stat_data)
+            self._coordinator.set_cursor(statistic_id, cumulative_sum, last_stat_time)
+
+    @staticmethod
+    def _hourly_by_day(series: dict[date, dict]) -> dict[int, float]:
+        """Aggregate the series of several days into usage by UTC epoch hour."""
+        now = dt_util.now()
+        hourly: dict[int, float] = {}
+
+        for data in series.values():
+            usage = aggregate_hourly(data.get("values", []), now)
+            for hour, value in zip(usage.hours, usage.usage):
+                hourly[hour] = hourly.get(hour, 0.0) + value
+
+        return hourly
+
+def _changed_hours(rows: dict[int, dict], hourly: dict[int, float], until: int) -> list[int]:
+    """Return the hours up to `until` whose usage differs from the recorded one, oldest first."""
+    return sorted(
+        hour
+        for hour, usage in hourly.items()
+        if hour <= until and abs(usage - ((rows[hour]["state"] or 0.0) if hour in rows else 0.0)) > TOLERANCE
+    )
+
+def _timestamp(start: float | datetime) -> int:
+    """Return the start of a recorded statistic as UTC epoch seconds."""
+    if isinstance(start, datetime):
+        return int(start.timestamp())
+    return int(start)
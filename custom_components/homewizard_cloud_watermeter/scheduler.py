@@ -0,0 +1,148 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+import hashlib
+import logging
+import statistics
+import time
+
+from .const import (
+    DEFAULT_UPDATE_INTERVAL_MINUTES,
+    MIN_UPDATE_INTERVAL_MINUTES,
+    MAX_UPDATE_INTERVAL_MINUTES,
+    SYNC_HISTORY_SIZE,
+    SYNC_MARGIN_MINUTES,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+class SyncCadenceScheduler:
+    """Predict when watermeters upload their data to the cloud.
+
+    Battery-powered watermeters upload their buffered data a few times per day. The
+    cadence of each device is learned from its successive sync times, so that the
+    next poll is planned just after the next expected upload. Devices that miss their
+    predicted upload (offline, or idle) are polled less and less often.
+    """
+
+    def __init__(self):
+        # Device identifier => last distinct sync times, oldest first
+        self._history: dict[str, deque[datetime]] = {}
+        # Device identifier => number of polls since the predicted upload that saw nothing new
+        self._misses: dict[str, int] = {}
+
+    def record(self, identifier: str, last_sync_at: datetime | None, now: datetime) -> None:
+        """Record the last sync time of a device seen by a poll."""
+        history = self._history.setdefault(identifier, deque(maxlen=SYNC_HISTORY_SIZE))
+
+        if last_sync_at is not None and (not history or last_sync_at > history[-1]):
+            history.append(last_sync_at)
+            self._misses[identifier] = 0
+            return
+
+        predicted = self._predict(identifier)
+        if predicted is None:
+            # Without a cadence yet, only a device silent for a day is considered offline
+            overdue = not history or now - history[-1] > timedelta(days=1)
+        else:
+            overdue = now >= predicted
+
+        if overdue:
+            self._misses[identifier] = self._misses.get(identifier, 0) + 1
+
+    def retain(self, identifiers: set[str]) -> None:
+        """Forget the devices that are not part of the home anymore."""
+        for identifier in set(self._history) - identifiers:
+            del self._history[identifier]
+            self._misses.pop(identifier, None)
+
+    def next_interval(self, now: datetime) -> tuple[timedelta, bool]:
+        """Return the delay until the next poll, and whether it follows a predicted upload."""
+        default = timedelta(minutes=DEFAULT_UPDATE_INTERVAL_MINUTES)
+        delays = []
+        predicted_delays = []
+
+        for identifier in self._history:
+            predicted = self._predict(identifier)
+            misses = self._misses.get(identifier, 0)
+
+            if predicted is not None and predicted > now:
+                delays.append(predicted - now)
+                predicted_delays.append(predicted - now)
+            elif misses:
+                # Overdue device, back off exponentially
+                delays.append(default * 2 ** min(misses - 1, 8))
+            else:
+                delays.append(default)
+
+        delay = min(delays, default=default)
+        delay = max(timedelta(minutes=MIN_UPDATE_INTERVAL_MINUTES), min(delay, timedelta(minutes=MAX_UPDATE_INTERVAL_MINUTES)))
+
+        _LOGGER.debug("Next HomeWizard poll planned in %s", delay)
+        return delay, bool(predicted_delays) and min(predicted_delays) == min(delays)
+
+    def cadence(self, identifier: str) -> timedelta | None:
+        """Return the median delay between the uploads of a device, None until two are known."""
+        history = self._history.get(identifier)
+        if not history or len(history) < 2:
+            return None
+
+        return timedelta(seconds=statistics.median(
+            (later - earlier).total_seconds() for earlier, later in zip(history, list(history)[1:])
+        ))
+
+    def _predict(self, identifier: str) -> datetime | None:
+        """Return when the next upload of a device is expected to be visible."""
+        cadence = self.cadence(identifier)
+        if cadence is None:
+            return None
+
+        return self._history[identifier][-1] + cadence + timedelta(minutes=SYNC_MARGIN_MINUTES)
+
+    def as_dict(self) -> dict:
+        return {
+            identifier: [sync_at.isoformat() for sync_at in history]
+            for identifier, history in self._history.items()
+        }
+
+    def load(self, data: dict) -> None:
+        for identifier, history in data.items():
+            self._history[identifier] = deque(
+                (datetime.fromisoformat(sync_at) for sync_at in history),
+                maxlen=SYNC_HISTORY_SIZE,
+            )
+
+class GlobalRequestLimiter:
+    """Process-wide ceiling on the concurrency and rate of outgoing HTTP calls.
+
+    Shared by the API clients of all config entries, so that the load on the
+    HomeWizard cloud stays flat as the number of entries grows.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_second: float):
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._spacing = 1 / max_per_second
+        self._next_slot = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Wait for a free request slot, then hold it during the request."""
+        async with self._semaphore:
+            # Reserve the next slot before sleeping, so that waiting callers are spaced out
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._spacing
+            if slot > now:
+                await asyncio.sleep(slot - now)
+            yield
+
+def entry_phase(entry_id: str, period: float) -> float:
+    """Return the deterministic offset of a config entry within a period, in seconds."""
+    digest = hashlib.sha256(entry_id.encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 * period
+
+def align_to_phase(now: datetime, delay: timedelta, phase: float, period: float) -> timedelta:
+    """Push a planned delay to the next time matching the phase of the entry within the period."""
+    target = now.timestamp() + delay.total_seconds()
+    return delay + timedelta(seconds=(phase - target) % period)
@@ -1,13 +1,19 @@
+from datetime import timedelta
 import logging
 from homeassistant.components.sensor import (
     EntityCategory,
     SensorDeviceClass,
     SensorEntity,
+    SensorStateClass,
 )
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.const import PERCENTAGE
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.util import dt as dt_util
+from homeassistant.const import PERCENTAGE, UnitOfTime, UnitOfVolume, UnitOfVolumeFlowRate
 
-from .const import DOMAIN
+from .const import DOMAIN, TSDB_INTERVAL_MINUTES
+from .entity import HomeWizardDeviceEntity, HomeWizardEntity
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,52 +22,79 @@ async def async_setup_entry(hass, entry, async_add_entities):
     coordinator = data["coordinator"]
 
     if not coordinator.data:
-        _LOGGER.error("No devices found, sensors will not be created")
+        _LOGGER.warning("No devices found yet, sensors will be created once they are")
 
-    entities = []
+    known_devices = set()
 
-    # Create a sensor for each homewizard device
-    for value in coordinator.data.values():
-        entities.append(HomeWizardTotalSensor(coordinator, value))
-        entities.append(HomeWizardLastSyncSensor(coordinator, value))
-        entities.append(HomeWizardWifiSensor(coordinator, value))
-        entities.append(HomeWizardOnlineSensor(coordinator, value))
+    @callback
+    def _async_sync_devices():
+        """Create the sensors of new devices and remove the devices that are gone."""
+        entities = []
 
-    async_add_entities(entities)
+        # Create a sensor for each homewizard device
+        for identifier, value in (coordinator.data or {}).items():
+            if identifier in known_devices:
+                continue
 
-class HomeWizardBaseSensor(CoordinatorEntity):
-    """Common base for all HomeWizard sensors."""
-    _attr_has_entity_name = True
+            known_devices.add(identifier)
+            entities.append(HomeWizardTotalSensor(coordinator, value))
+            entities.append(HomeWizardFlowRateSensor(coordinator, value))
+            entities.append(HomeWizardRollingUsageSensor(coordinator, value, 1))
+            entities.append(HomeWizardRollingUsageSensor(coordinator, value, 24))
+            entities.append(HomeWizardLastSyncSensor(coordinator, value))
+            entities.append(HomeWizardWifiSensor(coordinator, value))
+            entities.append(HomeWizardOnlineSensor(coordinator, value))
 
-    def __init__(self, coordinator, value):
-        """Initialize the sensor."""
-        super().__init__(coordinator)
-        self._sanitized_identifier = value["device"].get("sanitized_identifier")
+        if entities:
+            async_add_entities(entities)
 
-        # Unique ID needs to be unique per entity, so we append the class name or a suffix
-        # This will be overridden or extended in child classes
-        self._attr_unique_id = f"{self._sanitized_identifier}_{self.__class__.__name__}"
+        removed = known_devices - set(coordinator.data or {})
+        if removed:
+            device_registry = dr.async_get(hass)
+            for identifier in removed:
+                known_devices.discard(identifier)
+                device = device_registry.async_get_device(identifiers={(DOMAIN, identifier)})
+                if device is not None:
+                    _LOGGER.info("HomeWizard watermeter '%s' is gone, removing it", identifier)
+                    device_registry.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
 
-    @property
-    def device_info(self):
-        """Return device information to group all entities under the same device."""
-        device = self.coordinator.data.get(self._sanitized_identifier)["device"]
+    _async_sync_devices()
+    entry.async_on_unload(coordinator.async_add_listener(_async_sync_devices))
 
-        # Ensure we have a valid device
-        if not device:
-            return None
+    local_coordinator = coordinator.local_coordinator
+    if local_coordinator is not None:
+        live_devices = set()
 
-        return {
-            "identifiers": {(DOMAIN, self._sanitized_identifier)},
-            "name": device.get("name", "Watermeter"),
-            "manufacturer": "HomeWizard",
-            "model": "Watermeter",
-            "model_id": device.get("model"),
-            "hw_version": device.get("hardwareVersion"),
-            "sw_version": device.get("version"),
-        }
+        @callback
+        def _async_add_live_sensors():
+            """Create the meter reading of the meters matched to a LAN host, battery ones never are."""
+            entities = []
+
+            for identifier in local_coordinator.matched_identifiers - live_devices:
+                value = (coordinator.data or {}).get(identifier)
+                if value is None:
+                    continue
+
+                live_devices.add(identifier)
+                entities.append(HomeWizardLiveTotalSensor(coordinator, value))
 
-class HomeWizardTotalSensor(HomeWizardBaseSensor, SensorEntity):
+            live_devices.intersection_update(coordinator.data or {})
+
+            if entities:
+                async_add_entities(entities)
+
+        _async_add_live_sensors()
+        entry.async_on_unload(local_coordinator.async_add_listener(_async_add_live_sensors))
+
+    # Instrumentation of the polling itself, disabled by default
+    async_add_entities([
+        HomeWizardCycleDurationSensor(coordinator),
+        HomeWizardApiCounterSensor(coordinator, "requests", "API Requests"),
+        HomeWizardApiCounterSensor(coordinator, "errors", "API Errors"),
+        HomeWizardApiCounterSensor(coordinator, "retries", "API Retries"),
+    ])
+
+class HomeWizardTotalSensor(HomeWizardDeviceEntity, SensorEntity):
     def __init__(self, coordinator, data):
         super().__init__(coordinator, data)
 
@@ -73,9 +106,100 @@ class HomeWizardTotalSensor(HomeWizardBaseSensor, SensorEntity):
 
     @property
     def native_value(self):
-        return self.coordinator.data.get(self._sanitized_identifier)["total"]
+        return self._value["total"]
+
+class HomeWizardFlowRateSensor(HomeWizardDeviceEntity, SensorEntity):
+    """Live flow rate from the LAN, or average flow over the last 15-minute interval uploaded by the device.
+
+    The interval uploaded to the cloud only stands for the current flow until the next
+    upload is due, after that the flow is unknown rather than hours old.
+    """
+    _follows_local = True
+
+    def __init__(self, coordinator, data):
+        super().__init__(coordinator, data)
+
+        self._attr_name = "Flow Rate"
+        self._attr_unique_id = f"{self._sanitized_identifier}_flow_rate"
+        self._attr_device_class = SensorDeviceClass.VOLUME_FLOW_RATE
+        self._attr_native_unit_of_measurement = UnitOfVolumeFlowRate.LITERS_PER_MINUTE
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_suggested_display_precision = 2
+
+    @property
+    def native_value(self):
+        local_values = self.local_values
+        if local_values is not None and local_values["flow"] is not None:
+            return local_values["flow"]
+
+        usage = self._value.get("last_interval_usage")
+        if usage is None or self._cloud_interval_outdated():
+            return None
+        return usage / TSDB_INTERVAL_MINUTES
+
+    def _cloud_interval_outdated(self) -> bool:
+        last_sync_at = self._value["last_sync_at"]
+        if last_sync_at is None:
+            return True
+
+        max_age = timedelta(minutes=TSDB_INTERVAL_MINUTES) + self.coordinator.upload_cadence(self._sanitized_identifier)
+        return dt_util.utcnow() - last_sync_at > max_age
+
+    @property
+    def extra_state_attributes(self):
+        local_values = self.local_values
+        return {
+            "source": "local" if local_values is not None and local_values["flow"] is not None else "cloud",
+            "interval_usage": self._value.get("last_interval_usage"),
+            "interval_start": self._value["last_sync_at"],
+        }
+
+class HomeWizardRollingUsageSensor(HomeWizardDeviceEntity, SensorEntity):
+    """Usage over the last hours of data uploaded by the device, read from its in-memory window."""
+
+    def __init__(self, coordinator, data, hours: int):
+        super().__init__(coordinator, data)
+
+        self._duration = timedelta(hours=hours)
+        self._attr_name = "Usage Last Hour" if hours == 1 else f"Usage Last {hours} Hours"
+        self._attr_unique_id = f"{self._sanitized_identifier}_usage_{hours}h"
+        self._attr_device_class = SensorDeviceClass.WATER
+        self._attr_native_unit_of_measurement = UnitOfVolume.LITERS
+        self._attr_icon = "mdi:water-sync"
+
+    @property
+    def native_value(self):
+        window = self.coordinator.windows.get(self._sanitized_identifier)
+        return window.usage(self._duration) if window is not None else None
+
+    @property
+    def extra_state_attributes(self):
+        window = self.coordinator.windows.get(self._sanitized_identifier)
+        return {"window_end": window.end if window is not None else None}
+
+class HomeWizardLiveTotalSensor(HomeWizardDeviceEntity, SensorEntity):
+    """Meter reading polled on the LAN, unavailable while the meter cannot be reached."""
+    _follows_local = True
+
+    def __init__(self, coordinator, data):
+        super().__init__(coordinator, data)
+
+        self._attr_name = "Meter Reading"
+        self._attr_unique_id = f"{self._sanitized_identifier}_meter_reading"
+        self._attr_device_class = SensorDeviceClass.WATER
+        self._attr_native_unit_of_measurement = UnitOfVolume.LITERS
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def available(self) -> bool:
+        local_values = self.local_values
+        return super().available and local_values is not None and local_values["total"] is not None
+
+    @property
+    def native_value(self):
+        return self.local_values["total"]
 
-class HomeWizardLastSyncSensor(HomeWizardBaseSensor, SensorEntity):
+class HomeWizardLastSyncSensor(HomeWizardDeviceEntity, SensorEntity):
     def __init__(self, coordinator, data):
         super().__init__(coordinator, data)
 
@@ -87,9 +211,9 @@ class HomeWizardLastSyncSensor(HomeWizardBaseSensor, SensorEntity):
 
     @property
     def native_value(self):
-        return self.coordinator.data.get(self._sanitized_identifier)["last_sync_at"]
+        return self._value["last_sync_at"]
 
-class HomeWizardWifiSensor(HomeWizardBaseSensor, SensorEntity):
+class HomeWizardWifiSensor(HomeWizardDeviceEntity, SensorEntity):
     def __init__(self, coordinator, data):
         super().__init__(coordinator, data)
 
@@ -102,9 +226,9 @@ class HomeWizardWifiSensor(HomeWizardBaseSensor, SensorEntity):
 
     @property
     def native_value(self):
-        return self.coordinator.data.get(self._sanitized_identifier)["device"].get("wifiStrength", 0)
+        return self._value["device"].get("wifiStrength", 0)
 
-class HomeWizardOnlineSensor(HomeWizardBaseSensor, SensorEntity):
+class HomeWizardOnlineSensor(HomeWizardDeviceEntity, SensorEntity):
     def __init__(self, coordinator, data):
         super().__init__(coordinator, data)
 
@@ -116,4 +240,58 @@ class HomeWizardOnlineSensor(HomeWizardBaseSensor, SensorEntity):
 
     @property
     def native_value(self):
-        return self.coordinator.data.get(self._sanitized_identifier)["device"].get("onlineState", "Unknown")
+        return self._value["device"].get("onlineState", "Unknown")
+
+class HomeWizardHomeSensor(HomeWizardEntity, SensorEntity):
+    """Common base for the diagnostic sensors of a home, grouped under a service device."""
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+        self._home_identifier = f"home_{coordinator.home_id}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, self._home_identifier)},
+            "name": "HomeWizard Cloud",
+            "manufacturer": "HomeWizard",
+            "entry_type": DeviceEntryType.SERVICE,
+        }
+
+class HomeWizardCycleDurationSensor(HomeWizardHomeSensor):
+    def __init__(self, coordinator):
+        super().__init__(coordinator)
+
+        self._attr_name = "Last Update Duration"
+        self._attr_unique_id = f"{self._home_identifier}_last_update_duration"
+        self._attr_device_class = SensorDeviceClass.DURATION
+        self._attr_native_unit_of_measurement = UnitOfTime.SECONDS
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_suggested_display_precision = 2
+        self._attr_icon = "mdi:timer-outline"
+
+    @property
+    def native_value(self):
+        cycle = self.coordinator.last_cycle
+        return cycle.duration if cycle else None
+
+    @property
+    def extra_state_attributes(self):
+        cycle = self.coordinator.last_cycle
+        return {phase: round(duration, 3) for phase, duration in cycle.phases.items()} if cycle else None
+
+class HomeWizardApiCounterSensor(HomeWizardHomeSensor):
+    """Counter of the API client, shared by all the homes of the account."""
+
+    def __init__(self, coordinator, counter: str, name: str):
+        super().__init__(coordinator)
+
+        self._counter = counter
+        self._attr_name = name
+        self._attr_unique_id = f"{self._home_identifier}_api_{counter}"
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
+        self._attr_icon = "mdi:cloud-sync"
+
+    @property
+    def native_value(self):
+        return self.coordinator.api.metrics.total(self._counter)
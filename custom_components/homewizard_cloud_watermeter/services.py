@@ -0,0 +1,153 @@
+from datetime import date, timedelta
+import logging
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import device_registry as dr
+import homeassistant.helpers.config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    SERVICE_BACKFILL,
+    SERVICE_EXPORT,
+    SERVICE_GET_USAGE,
+    ATTR_DAYS,
+    ATTR_DEVICE_ID,
+    ATTR_END_DATE,
+    ATTR_FORMAT,
+    ATTR_HOURS,
+    ATTR_START_DATE,
+    EXPORT_FORMAT_CSV,
+    EXPORT_FORMAT_PARQUET,
+    MAX_BACKFILL_DAYS,
+    USAGE_WINDOW_HOURS,
+)
+from .export import parquet_available
+
+_LOGGER = logging.getLogger(__name__)
+
+BACKFILL_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_DAYS): vol.All(vol.Coerce(int), vol.Range(min=1, max=MAX_BACKFILL_DAYS)),
+})
+
+GET_USAGE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_HOURS, default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=USAGE_WINDOW_HOURS)),
+    vol.Optional(ATTR_DEVICE_ID): str,
+})
+
+EXPORT_SCHEMA = vol.Schema({
+    vol.Required(ATTR_START_DATE): cv.date,
+    vol.Optional(ATTR_END_DATE): cv.date,
+    vol.Optional(ATTR_DEVICE_ID): vol.All(cv.ensure_list, [str]),
+    vol.Optional(ATTR_FORMAT, default=EXPORT_FORMAT_CSV): vol.In([EXPORT_FORMAT_CSV, EXPORT_FORMAT_PARQUET]),
+})
+
+@callback
+def _async_device_identifiers(hass: HomeAssistant, device_ids: list[str]) -> set[str]:
+    """Return the sanitized identifiers of the watermeters behind device registry ids."""
+    device_registry = dr.async_get(hass)
+    identifiers = set()
+
+    for device_id in device_ids:
+        device_entry = device_registry.async_get(device_id)
+        identifier = next(
+            (value for domain, value in (device_entry.identifiers if device_entry else ()) if domain == DOMAIN),
+            None,
+        )
+        if identifier is None:
+            raise ServiceValidationError(f"Device {device_id} is not a HomeWizard watermeter")
+        identifiers.add(identifier)
+
+    return identifiers
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_handle_backfill(call: ServiceCall) -> None:
+        """Backfill the statistics of all configured watermeters."""
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            if entry.entry_id not in hass.data.get(DOMAIN, {}):
+                continue
+
+            coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+            devices = [value["device"] for value in (coordinator.data or {}).values()]
+            coordinator.backfill.async_start(devices, call.data.get(ATTR_DAYS))
+
+    async def async_handle_get_usage(call: ServiceCall) -> ServiceResponse:
+        """Return the recent usage of the watermeters, read from memory without any request."""
+        duration = timedelta(hours=call.data[ATTR_HOURS])
+        device_registry = dr.async_get(hass)
+        identifiers = (
+            _async_device_identifiers(hass, [call.data[ATTR_DEVICE_ID]]) if ATTR_DEVICE_ID in call.data else None
+        )
+
+        meters = []
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            if entry.entry_id not in hass.data.get(DOMAIN, {}):
+                continue
+
+            coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+            for sanitized, value in (coordinator.data or {}).items():
+                if identifiers is not None and sanitized not in identifiers:
+                    continue
+
+                window = coordinator.windows.get(sanitized)
+                if window is None or window.end is None:
+                    continue
+
+                device_entry = device_registry.async_get_device(identifiers={(DOMAIN, sanitized)})
+                meters.append({
+                    "device_id": device_entry.id if device_entry else None,
+                    "identifier": sanitized,
+                    "name": value["device"].get("name"),
+                    "usage": window.usage(duration),
+                    "start": (window.end - duration).isoformat(),
+                    "end": window.end.isoformat(),
+                    "intervals": [
+                        {"start": start.isoformat(), "usage": usage}
+                        for start, usage in window.intervals(duration)
+                    ],
+                })
+
+        return {"meters": meters}
+
+    async def async_handle_export(call: ServiceCall) -> None:
+        """Export the history of the selected watermeters to files in the background."""
+        start_day: date = call.data[ATTR_START_DATE]
+        end_day: date = call.data.get(ATTR_END_DATE, dt_util.now().date() - timedelta(days=1))
+        file_format = call.data[ATTR_FORMAT]
+
+        if start_day > end_day:
+            raise ServiceValidationError(f"The export must start before its end ({end_day})")
+        if file_format == EXPORT_FORMAT_PARQUET and not await hass.async_add_executor_job(parquet_available):
+            raise ServiceValidationError("Exporting to Parquet requires pyarrow to be installed")
+
+        identifiers = (
+            _async_device_identifiers(hass, call.data[ATTR_DEVICE_ID]) if ATTR_DEVICE_ID in call.data else None
+        )
+
+        for entry in hass.config_entries.async_entries(DOMAIN):
+            if entry.entry_id not in hass.data.get(DOMAIN, {}):
+                continue
+
+            coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+            devices = [
+                value["device"]
+                for sanitized, value in (coordinator.data or {}).items()
+                if identifiers is None or sanitized in identifiers
+            ]
+            if devices:
+                coordinator.export.async_start(devices, start_day, end_day, file_format)
+
+    hass.services.async_register(DOMAIN, SERVICE_BACKFILL, async_handle_backfill, schema=BACKFILL_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_EXPORT, async_handle_export, schema=EXPORT_SCHEMA)
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_GET_USAGE,
+        async_handle_get_usage,
+        schema=GET_USAGE_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )